@@ -10,6 +10,7 @@ from cowidev.cmd.xm import click_xm
 from cowidev.cmd.gmobility import click_gm
 from cowidev.cmd.variants import click_variants
 from cowidev.megafile.generate import generate_megafile
+from cowidev.utils.web.cache import CACHE_MODES, set_cache_mode
 
 
 @click.group(name="cowid", cls=OrderedGroup)
@@ -26,18 +27,67 @@ from cowidev.megafile.generate import generate_megafile
     help="Number of threads to use.",
     show_default=True,
 )
+@click.option(
+    "--n-jobs-driver",
+    default=CONFIG.execution.njobs_driver,
+    type=int,
+    help="Number of threads for Selenium-based modules (and of warm browsers). Defaults to a quarter of --n-jobs.",
+)
+@click.option(
+    "--max-requests-per-host",
+    default=CONFIG.execution.max_requests_per_host,
+    type=int,
+    help="Maximum number of concurrent requests to the same host. Defaults to 8.",
+)
+@click.option(
+    "--max-retries",
+    default=CONFIG.execution.max_retries,
+    type=int,
+    help="Number of times a failed module is retried.",
+    show_default=True,
+)
+@click.option(
+    "--http-cache",
+    type=click.Choice(CACHE_MODES),
+    default=None,
+    help="HTTP response cache mode. Use 'offline' to replay cached responses without network access. Defaults to"
+    " environment variable OWID_COVID_HTTP_CACHE, or 'on' if not set.",
+)
 @click.pass_context
-def cli(ctx, parallel, n_jobs):
+def cli(ctx, parallel, n_jobs, n_jobs_driver, max_requests_per_host, max_retries, http_cache):
     """COVID-19 Data pipeline tool by Our World in Data."""
+    if http_cache is not None:
+        set_cache_mode(http_cache)
     ctx.ensure_object(dict)
     ctx.obj["parallel"] = parallel
     ctx.obj["n_jobs"] = n_jobs
+    ctx.obj["n_jobs_driver"] = n_jobs_driver
+    ctx.obj["max_requests_per_host"] = max_requests_per_host
+    ctx.obj["max_retries"] = max_retries
 
 
 @click.command(name="megafile")
-def cli_export():
+@click.option(
+    "--incremental/--no-incremental",
+    default=False,
+    help="Only recompute locations whose input data changed since the last incremental run.",
+    show_default=True,
+)
+@click.option(
+    "--lean/--no-lean",
+    default=False,
+    help="Export from a frame with compact dtypes (categorical locations, float32 counts) to reduce peak memory.",
+    show_default=True,
+)
+@click.option(
+    "--max-rss",
+    type=int,
+    default=None,
+    help="Fail if the peak memory (RSS, in MB) exceeds this value.",
+)
+def cli_export(incremental, lean, max_rss):
     """COVID-19 data integration pipeline (former megafile)"""
-    generate_megafile()
+    generate_megafile(incremental=incremental, lean=lean, max_rss=max_rss)
 
 
 cli.add_command(click_test)
@@ -1,11 +1,19 @@
+import os
 import time
 import importlib
 import traceback
+from functools import partial
 
-from joblib import Parallel, delayed
+from botocore.exceptions import ClientError
+from joblib import effective_n_jobs
 import pandas as pd
 
+from cowidev.cmd.commons.scheduler import ModuleScheduler, build_module_stats
 from cowidev.utils.log import get_logger, print_eoe, system_details
+from cowidev.utils.params import CONFIG
+from cowidev.utils.web.client import init_client
+from cowidev.utils.web.drivers import get_driver_pool
+from cowidev.utils.web.scraping import get_json_stats
 from cowidev.utils.utils import export_timestamp
 from cowidev.utils.s3 import obj_from_s3, obj_to_s3
 from cowidev.utils.clean.dates import localdate
@@ -18,6 +26,9 @@ logger = get_logger()
 LOG_MACHINES = "s3://covid-19/log/machines.json"
 LOG_GET_COUNTRIES = "s3://covid-19/log/{}-get-data-countries.csv"
 LOG_GET_GLOBAL = "s3://covid-19/log/{}-get-data-global.csv"
+# Only the latest runs are needed to estimate modules' execution times
+LOG_TAIL_BYTES = 2 * 1024 * 1024
+LOG_STATS_COLUMNS = ["module", "date", "execution_time (sec)", "success"]
 
 
 class CountryDataGetter:
@@ -36,25 +47,39 @@ class CountryDataGetter:
             return {"module_name": module_name, "success": None, "skipped": True, "time": None, "error": ""}
         # Start country scraping
         logger.info(f"{self.log_header} - {module_name}: started")
+        get_json_stats(reset=True)
         module = importlib.import_module(module_name)
         try:
             module.main()
         except Exception as err:
             success = False
             logger.error(f"{self.log_header} - {module_name}: ❌ {err}", exc_info=True)
-            error_msg = err
+            # As string, so that results can be sent back from worker processes
+            error_msg = str(err)
         else:
             success = True
             logger.info(f"{self.log_header} - {module_name}: SUCCESS ✅")
             error_msg = ""
         t = round(time.time() - t0, 2)
-        return {"module_name": module_name, "success": success, "skipped": False, "time": t, "error": error_msg}
+        json_stats = get_json_stats(reset=True)
+        return {
+            "module_name": module_name,
+            "success": success,
+            "skipped": False,
+            "time": t,
+            "error": error_msg,
+            "json_time": round(json_stats["time"], 2),
+            "json_mb": round(json_stats["bytes"] / 1e6, 2),
+        }
 
 
 def main_get_data(
     modules: list,
     parallel: bool = False,
     n_jobs: int = -2,
+    n_jobs_driver: int = None,
+    max_requests_per_host: int = None,
+    max_retries: int = 1,
     modules_skip: list = [],
     log_header: str = "",
     log_s3_path=None,
@@ -64,34 +89,51 @@ def main_get_data(
     """Get data from sources and export to output folder.
 
     Is equivalent to script `run_python_scripts.py`
+
+    Modules are scheduled longest-first, based on the timing log at `log_s3_path` (if given) or on the last status
+    (`output_status`). Selenium-based modules run in a separate pool of `n_jobs_driver` workers (defaults to a quarter
+    of `n_jobs`), which also sets the size of the pool of warm browsers. Failed modules are retried up to `max_retries`
+    times, concurrently with the rest. Modules run in threads or processes depending on the execution backend set in
+    the configuration file (only if `parallel` is True). If `parallel` is False, modules run one after the other in the
+    given order, and failed modules are retried at the end.
     """
     t0 = time.time()
     print("-- Getting data... --")
     country_data_getter = CountryDataGetter(modules_skip, log_header)
-    if log_s3_path:
-        modules = _load_modules_order(modules, log_s3_path)
     if parallel:
-        modules_execution_results = Parallel(n_jobs=n_jobs, backend="threading")(
-            delayed(country_data_getter.run)(
-                module_name,
-            )
-            for module_name in modules
-        )
+        n_jobs = effective_n_jobs(n_jobs)
+        if n_jobs_driver is None:
+            n_jobs_driver = max(1, n_jobs // 4)
     else:
-        modules_execution_results = []
-        for module_name in modules:
-            modules_execution_results.append(
-                country_data_getter.run(
-                    module_name,
-                )
-            )
-    t_sec_1 = round(time.time() - t0, 2)
+        n_jobs = 1
+        n_jobs_driver = None
+    # Per-host request cap, in this process and in worker processes
+    init_worker = None
+    if max_requests_per_host is not None:
+        init_client(max_requests_per_host=max_requests_per_host)
+        init_worker = partial(init_client, max_requests_per_host=max_requests_per_host)
+    # Warm browsers: as many as Selenium-based modules can run at the same time
+    get_driver_pool().resize(n_jobs_driver or 1)
+    scheduler = ModuleScheduler(
+        run_module=country_data_getter.run,
+        n_jobs=n_jobs,
+        n_jobs_driver=n_jobs_driver,
+        stats=_load_modules_stats(log_s3_path, output_status),
+        max_retries=max_retries,
+        backend_for=CONFIG.execution.backend_for if parallel else None,
+        initializer=init_worker,
+    )
+    try:
+        modules_execution_results = scheduler.run(modules)
+    finally:
+        get_driver_pool().close()
+    t_sec_1 = scheduler.t_first_pass
     # Get timing dataframe
     df_exec = _build_df_execution(modules_execution_results)
     if output_status is not None:
         export_status(modules_execution_results, output_status, output_status_ts)
-    # Retry failed modules
-    _retry_modules_failed(modules_execution_results, country_data_getter)
+    # Report failed modules
+    _report_modules_failed(modules_execution_results)
     # Print timing details
     t_sec_1, t_min_1, t_sec_2, t_min_2 = _print_timing(t0, t_sec_1, df_exec)
     print_eoe()
@@ -116,7 +158,13 @@ def _build_df_execution(modules_execution_results):
     df_exec = (
         pd.DataFrame(
             [
-                {"module": m["module_name"], "execution_time (sec)": m["time"], "success": m["success"]}
+                {
+                    "module": m["module_name"],
+                    "execution_time (sec)": m["time"],
+                    "json_decoding_time (sec)": m.get("json_time"),
+                    "json_size (MB)": m.get("json_mb"),
+                    "success": m["success"],
+                }
                 for m in modules_execution_results
             ]
         )
@@ -141,16 +189,11 @@ def _build_df_status(modules_execution_results):
     return df_exec
 
 
-def _retry_modules_failed(modules_execution_results, country_data_getter):
+def _report_modules_failed(modules_execution_results):
     modules_failed = [m["module_name"] for m in modules_execution_results if m["success"] is False]
-    logger.info(f"\n---\n\nRETRIES ({len(modules_failed)})")
-    modules_execution_results = []
-    for module_name in modules_failed:
-        modules_execution_results.append(country_data_getter.run(module_name))
-    modules_failed_retrial = [m["module_name"] for m in modules_execution_results if m["success"] is False]
-    if len(modules_failed_retrial) > 0:
-        failed_str = "\n".join([f"* {m}" for m in modules_failed_retrial])
-        print(f"\n---\n\nFAILED\nThe following scripts failed to run ({len(modules_failed_retrial)}):\n{failed_str}")
+    if len(modules_failed) > 0:
+        failed_str = "\n".join([f"* {m}" for m in modules_failed])
+        print(f"\n---\n\nFAILED\nThe following scripts failed to run ({len(modules_failed)}):\n{failed_str}")
 
 
 def _print_timing(t0, t_sec_1, df_time):
@@ -161,31 +204,30 @@ def _print_timing(t0, t_sec_1, df_time):
     print("TIMING DETAILS")
     print(f"Took {t_sec_1} seconds (i.e. {t_min_1} minutes).")
     print(f"Top 20 most time consuming scripts:")
-    print(df_time[["execution_time (sec)"]].head(20))
+    print(df_time[["execution_time (sec)", "json_decoding_time (sec)", "json_size (MB)"]].head(20))
     print(f"\nTook {t_sec_2} seconds (i.e. {t_min_2} minutes) [AFTER RETRIALS].")
     print("---")
     return t_sec_1, t_min_1, t_sec_2, t_min_2
 
 
-def _load_modules_order(modules_name, path_log):
-    if len(modules_name) < 10:
-        return modules_name
-    df = obj_from_s3(path_log)
-    # Filter by machine
-    # details = system_details()
-    # machine = details["id"]
-    # if machine in df.machine:
-    #     df = df[df.machine == machine]
-    # df = pd.read_csv(os.path.join(PATHS.INTERNAL_OUTPUT_VAX_LOG_DIR, "get-data.csv"))
-    module_order_all = (
-        df.sort_values("date")
-        .drop_duplicates(subset=["module"], keep="last")
-        .sort_values("execution_time (sec)", ascending=False)
-        .module.tolist()
-    )
-    modules_name_order = [m for m in module_order_all if m in modules_name]
-    missing = [m for m in modules_name if m not in modules_name_order]
-    return modules_name_order + missing
+def _load_modules_stats(path_log=None, path_status=None):
+    """Load historical execution statistics of modules, from S3 timing log or local status file."""
+    try:
+        if path_log is not None:
+            df = obj_from_s3(path_log, tail=LOG_TAIL_BYTES, usecols=lambda col: col in LOG_STATS_COLUMNS)
+        elif path_status is not None and os.path.isfile(path_status):
+            df = pd.read_csv(path_status)
+        else:
+            return None
+        # Filter by machine
+        # details = system_details()
+        # machine = details["id"]
+        # if machine in df.machine:
+        #     df = df[df.machine == machine]
+        return build_module_stats(df)
+    except (OSError, ValueError, KeyError, ClientError) as err:
+        logger.warning(f"Could not load modules execution history, modules will run in default order: {err}")
+        return None
 
 
 # def _export_log_info(df_exec, t_sec_1, t_sec_2):
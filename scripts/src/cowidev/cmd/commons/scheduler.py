@@ -0,0 +1,230 @@
+"""Scheduling of country modules in the `get` step.
+
+Modules are run longest-first (LPT scheduling), using their historical execution times and failure rates. Modules
+that drive a browser (Selenium) run in their own, smaller, pool so that they do not exhaust the machine's resources nor
+block plain-HTTP modules. CPU-heavy modules can run in a pool of processes instead of threads, so that they do not
+serialize on the GIL (see `execution.backend` in the configuration file). Failed modules are retried concurrently with
+the rest, after an exponential backoff.
+
+With a single worker (and no separate pools), modules are run one after the other in the given order, and failed
+modules are retried at the end.
+"""
+import heapq
+import importlib.util
+import itertools
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+
+import pandas as pd
+
+from cowidev.utils.log import get_logger
+
+
+logger = get_logger()
+
+COL_TIME = "execution_time (sec)"
+
+
+@dataclass
+class ModuleTask:
+    module_name: str
+    cost: float
+    uses_driver: bool = False
+    backend: str = "threads"
+    attempt: int = 0
+
+
+def module_uses_driver(module_name: str) -> bool:
+    """Check if module `module_name` uses a Selenium driver, by inspecting its source (the module is not imported)."""
+    try:
+        spec = importlib.util.find_spec(module_name)
+    except (ImportError, ValueError):
+        return False
+    if spec is None or spec.origin is None or not spec.origin.endswith(".py"):
+        return False
+    with open(spec.origin) as f:
+        source = f.read()
+    return "get_driver" in source or "webdriver" in source
+
+
+def build_module_stats(df: pd.DataFrame, n_last: int = 5) -> pd.DataFrame:
+    """Build execution statistics per module from a timing log.
+
+    Args:
+        df (pd.DataFrame): Timing log, with columns `module`, `execution_time (sec)` and optionally `success` and
+                            `date`.
+        n_last (int, optional): Number of most recent runs to consider per module. Defaults to 5.
+
+    Returns:
+        pd.DataFrame: Statistics, indexed by module, with columns `time` (average time of the last runs) and
+                        `failure_rate`.
+    """
+    if "date" in df.columns:
+        df = df.sort_values("date")
+    df = df.dropna(subset=[COL_TIME]).groupby("module").tail(n_last)
+    if "success" in df.columns:
+        success = df.success.astype(str).str.lower() == "true"
+    else:
+        success = pd.Series(True, index=df.index)
+    stats = (
+        df.assign(failure=~success).groupby("module").agg(time=(COL_TIME, "mean"), failure_rate=("failure", "mean"))
+    )
+    return stats
+
+
+class ModuleScheduler:
+    """Run country modules concurrently, longest expected time first.
+
+    Args:
+        run_module (callable): Function running a module. It receives the module name and returns a dictionary with
+                                at least field `success` (False if the module failed). Must be picklable if any module
+                                runs with backend 'processes'.
+        n_jobs (int, optional): Number of workers for plain-HTTP modules. Defaults to 1.
+        n_jobs_driver (int, optional): Number of workers for Selenium-based modules. If None, these modules share the
+                                        pool with the rest. Defaults to None.
+        stats (pd.DataFrame, optional): Historical statistics per module (see `build_module_stats`). Defaults to None.
+        max_retries (int, optional): Number of times a failed module is retried. Defaults to 1.
+        backoff (float, optional): Seconds to wait before the first retry. Doubles with every attempt. Defaults to 10.
+        backend_for (callable, optional): Function returning the backend of a module ('threads' or 'processes').
+                                            Selenium-based modules always run in threads. Defaults to None (all modules
+                                            run in threads).
+        initializer (callable, optional): Function called at the start of each worker process (must be picklable).
+                                            Defaults to None.
+    """
+
+    def __init__(
+        self,
+        run_module,
+        n_jobs: int = 1,
+        n_jobs_driver: int = None,
+        stats: pd.DataFrame = None,
+        max_retries: int = 1,
+        backoff: float = 10,
+        backend_for=None,
+        initializer=None,
+    ):
+        self.run_module = run_module
+        self.n_jobs = n_jobs
+        self.n_jobs_driver = n_jobs_driver
+        self.stats = stats
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backend_for = backend_for
+        self.initializer = initializer
+        self.t_first_pass = None
+
+    def build_tasks(self, modules: list) -> list:
+        """Build tasks for `modules`, sorted by expected cost (descending).
+
+        The expected cost of a module is its average time, weighted by its failure rate (a failed module is run
+        again). Modules with no history are assigned the median cost.
+        """
+        costs = {}
+        if self.stats is not None and not self.stats.empty:
+            stats = self.stats[self.stats.index.isin(modules)]
+            costs = (stats.time * (1 + stats.failure_rate.fillna(0))).to_dict()
+        cost_default = pd.Series(list(costs.values()), dtype=float).median() if costs else 0
+        tasks = []
+        for m in modules:
+            uses_driver = module_uses_driver(m)
+            if uses_driver or self.backend_for is None:
+                backend = "threads"
+            else:
+                backend = self.backend_for(m)
+            tasks.append(
+                ModuleTask(module_name=m, cost=costs.get(m, cost_default), uses_driver=uses_driver, backend=backend)
+            )
+        return sorted(tasks, key=lambda t: t.cost, reverse=True)
+
+    def run(self, modules: list) -> list:
+        """Run `modules`.
+
+        Returns:
+            list: Result of the last attempt of each module, sorted by expected cost (in the given order if run
+                    serially).
+        """
+        if self.n_jobs == 1 and self.n_jobs_driver is None and self.backend_for is None:
+            return self._run_serial(modules)
+        tasks = self.build_tasks(modules)
+        t0 = time.time()
+        pools = self._start_pools(tasks)
+        try:
+            results = self._run_tasks(tasks, pools, t0)
+        finally:
+            for executor in set(pools.values()):
+                executor.shutdown()
+        if self.t_first_pass is None:
+            self.t_first_pass = round(time.time() - t0, 2)
+        return [results[task.module_name] for task in tasks]
+
+    def _run_serial(self, modules: list) -> list:
+        """Run `modules` one after the other, then retry the failed ones."""
+        t0 = time.time()
+        results = {module_name: self.run_module(module_name) for module_name in modules}
+        self.t_first_pass = round(time.time() - t0, 2)
+        for _ in range(self.max_retries):
+            modules_failed = [module_name for module_name, result in results.items() if result["success"] is False]
+            logger.info(f"\n---\n\nRETRIES ({len(modules_failed)})")
+            for module_name in modules_failed:
+                results[module_name] = self.run_module(module_name)
+        return list(results.values())
+
+    def _start_pools(self, tasks: list) -> dict:
+        """Create the executors, by kind of task ('threads', 'driver' or 'processes')."""
+        pools = {"threads": ThreadPoolExecutor(max_workers=self.n_jobs)}
+        if self.n_jobs_driver is not None:
+            pools["driver"] = ThreadPoolExecutor(max_workers=self.n_jobs_driver)
+        else:
+            pools["driver"] = pools["threads"]
+        if any(task.backend == "processes" for task in tasks):
+            # Spawn (rather than fork) so that workers do not inherit open connections or locks from threads
+            pools["processes"] = ProcessPoolExecutor(
+                max_workers=self.n_jobs, mp_context=multiprocessing.get_context("spawn"), initializer=self.initializer
+            )
+        return pools
+
+    def _submit(self, pools: dict, task: ModuleTask):
+        executor = pools["driver"] if task.uses_driver else pools[task.backend]
+        return executor.submit(self.run_module, task.module_name)
+
+    def _run_tasks(self, tasks: list, pools: dict, t0: float) -> dict:
+        """Run `tasks` (and their retries) until all are done. Returns the result of each module."""
+        results = {}
+        # Heap of retries, as (time, counter, task). The counter breaks ties
+        retries = []
+        counter = itertools.count()
+        n_first_pending = len(tasks)
+        pending = {self._submit(pools, task): task for task in tasks}
+        while pending or retries:
+            timeout = self._submit_retries_due(retries, pending, pools)
+            if not pending:
+                time.sleep(timeout)
+                continue
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = pending.pop(future)
+                results[task.module_name] = future.result()
+                if task.attempt == 0:
+                    n_first_pending -= 1
+                    if n_first_pending == 0:
+                        self.t_first_pass = round(time.time() - t0, 2)
+                if results[task.module_name]["success"] is False and task.attempt < self.max_retries:
+                    heapq.heappush(retries, (self._retry_time(task), next(counter), task))
+        return results
+
+    def _submit_retries_due(self, retries: list, pending: dict, pools: dict):
+        """Submit retries whose backoff is over. Returns the time until the next retry is due (None if no retry)."""
+        now = time.time()
+        while retries and retries[0][0] <= now:
+            _, _, task = heapq.heappop(retries)
+            pending[self._submit(pools, task)] = task
+        return max(retries[0][0] - now, 0) if retries else None
+
+    def _retry_time(self, task: ModuleTask) -> float:
+        """Schedule a new attempt of `task`. Returns the time when it is due."""
+        task.attempt += 1
+        delay = self.backoff * 2 ** (task.attempt - 1)
+        logger.info(f"{task.module_name}: retry {task.attempt}/{self.max_retries} in {delay} sec")
+        return time.time() + delay
@@ -62,6 +62,9 @@ def click_test_get(ctx, countries, skip_countries):
     main_get_data(
         parallel=ctx.obj["parallel"],
         n_jobs=ctx.obj["n_jobs"],
+        n_jobs_driver=ctx.obj["n_jobs_driver"],
+        max_requests_per_host=ctx.obj["max_requests_per_host"],
+        max_retries=ctx.obj["max_retries"],
         modules=modules,
         modules_skip=modules_skip,
         log_header="TEST",
@@ -1,5 +1,4 @@
 import os
-import itertools
 from datetime import datetime
 from math import isnan
 import glob
@@ -11,8 +10,10 @@ import pandas as pd
 from pandas.api.types import is_numeric_dtype
 
 from cowidev import PATHS
-from cowidev.utils.utils import pd_series_diff_values
+from cowidev.utils.aggregates import aggregate
+from cowidev.utils.utils import latest_values, pd_series_diff_values
 from cowidev.utils.clean import clean_date
+from cowidev.utils.io import json_objects, read_table
 from cowidev.utils.log import get_logger
 from cowidev.vax.utils.checks import VACCINES_ACCEPTED
 
@@ -54,16 +55,16 @@ class DatasetGenerator:
 
         aggregates = {
             "World": {
-                "excluded_locs": ["England", "Northern Ireland", "Scotland", "Wales"],
-                "included_locs": None,
+                "exclude": ["England", "Northern Ireland", "Scotland", "Wales"],
+                "include": None,
             },
             "European Union": {
-                "excluded_locs": None,
-                "included_locs": eu_countries,
+                "exclude": None,
+                "include": eu_countries,
             },
             "World excl. China": {
-                "excluded_locs": ["China"],
-                "included_locs": None,
+                "exclude": ["China"],
+                "include": None,
             },
         }
         for continent in [
@@ -75,15 +76,15 @@ class DatasetGenerator:
             "South America",
         ]:
             aggregates[continent] = {
-                "excluded_locs": None,
-                "included_locs": (
+                "exclude": None,
+                "include": (
                     continent_countries.loc[continent_countries["Unnamed: 3"] == continent, "Entity"].tolist()
                 ),
             }
         for group in income_groups["Income group"].unique():
             aggregates[group] = {
-                "excluded_locs": None,
-                "included_locs": (income_groups.loc[income_groups["Income group"] == group, "Country"].tolist()),
+                "exclude": None,
+                "include": (income_groups.loc[income_groups["Income group"] == group, "Country"].tolist()),
             }
         return aggregates
 
@@ -101,15 +102,11 @@ class DatasetGenerator:
         def _pretty_vaccine(vaccines):
             return ", ".join(sorted(v.strip() for v in vaccines.split(",")))
 
-        df_vax = (
-            df_vax.sort_values(by=["location", "date"])
-            .drop_duplicates(subset=["location"], keep="last")
-            .rename(
-                columns={
-                    "date": "last_observation_date",
-                    "source_url": "source_website",
-                }
-            )
+        df_vax = latest_values(df_vax, by="location", sort_by="date", skipna=False).rename(
+            columns={
+                "date": "last_observation_date",
+                "source_url": "source_website",
+            }
         )
 
         if len(df_metadata) != len(df_vax):
@@ -135,25 +132,9 @@ class DatasetGenerator:
             ]
         ]
 
-    def _get_aggregate(self, df, agg_name, included_locs, excluded_locs):
-        # Take rows that matter
-        agg = df[~df.location.isin(self.aggregates.keys())]  # remove aggregated rows
-        if excluded_locs is not None:
-            agg = agg[~agg.location.isin(excluded_locs)]
-        elif included_locs is not None:
-            agg = agg[agg.location.isin(included_locs)]
-
-        # Get full location-date grid
-        agg = (
-            pd.DataFrame(
-                itertools.product(agg.location.unique(), agg.date.unique()),
-                columns=[agg.location.name, agg.date.name],
-            )
-            .merge(agg, on=["date", "location"], how="outer")
-            .sort_values(by=["location", "date"])
-        )
-
-        # NaN: Forward filling + Zero-filling if all metric is NaN
+    def pipe_aggregates(self, df: pd.DataFrame) -> pd.DataFrame:
+        logger.info(f"Building aggregate regions {list(self.aggregates.keys())}")
+        # NaN: Forward filling (locations contribute with their last reported value)
         cols = [
             "total_vaccinations",
             "people_vaccinated",
@@ -163,28 +144,13 @@ class DatasetGenerator:
             "new_vaccinations_smoothed",
             "new_people_vaccinated_smoothed",
         ]
-        grouper = agg.groupby("location")
-        for col in cols:
-            agg[col] = grouper[col].apply(lambda x: x.fillna(0) if x.isnull().all() else x.fillna(method="ffill"))
-
-        # Aggregate
-        agg = agg.groupby("date").sum().reset_index().assign(location=agg_name)
-        agg = agg[agg.date.dt.date < datetime.now().date()]
-        return agg
-
-    def pipe_aggregates(self, df: pd.DataFrame) -> pd.DataFrame:
-        logger.info(f"Building aggregate regions {list(self.aggregates.keys())}")
-        aggs = []
-        for agg_name, _ in self.aggregates.items():
-            aggs.append(
-                self._get_aggregate(
-                    df=df,
-                    agg_name=agg_name,
-                    included_locs=self.aggregates[agg_name]["included_locs"],
-                    excluded_locs=self.aggregates[agg_name]["excluded_locs"],
-                )
-            )
-        return pd.concat([df] + aggs, ignore_index=True)
+        aggs = aggregate(
+            df[~df.location.isin(self.aggregates.keys())],  # remove aggregated rows
+            self.aggregates,
+            ffill=cols,
+        )
+        aggs = aggs[aggs.date.dt.date < datetime.now().date()]
+        return pd.concat([df, aggs], ignore_index=True)
 
     def pipe_daily(self, df: pd.DataFrame) -> pd.DataFrame:
         logger.info("Adding daily metrics")
@@ -372,23 +338,9 @@ class DatasetGenerator:
             ]
         ]
 
-    def pipe_vaccinations_json(self, df: pd.DataFrame) -> list:
-        location_iso_codes = df[["location", "iso_code"]].drop_duplicates().values.tolist()
-        metrics = [column for column in df.columns if column not in {"location", "iso_code"}]
-        df = df.assign(date=df.date.apply(clean_date))
-        return [
-            {
-                "country": location,
-                "iso_code": iso_code,
-                "data": [
-                    {**x[i]}
-                    for i, x in df.loc[(df.location == location) & (df.iso_code == iso_code), metrics]
-                    .stack()
-                    .groupby(level=0)
-                ],
-            }
-            for location, iso_code in location_iso_codes
-        ]
+    def pipe_vaccinations_json(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Prepare data for `vaccinations.json` (written with `_write_vaccinations_json`)."""
+        return df.assign(date=df.date.apply(clean_date))
 
     def pipe_manufacturer_select_cols(self, df: pd.DataFrame) -> pd.DataFrame:
         return df[
@@ -402,22 +354,14 @@ class DatasetGenerator:
 
     def pipe_manufacturer_add_eu(self, df: pd.DataFrame) -> pd.DataFrame:
         eu_countries = pd.read_csv(PATHS.INTERNAL_INPUT_OWID_EU_FILE, usecols=["Country"], squeeze=True).tolist()
-        eu_manufacturer = (
-            df[df.location.isin(eu_countries)]
-            .pivot(index=["location", "vaccine"], columns="date", values="total_vaccinations")
-            .reset_index()
-            .melt(id_vars=["location", "vaccine"], var_name="date", value_name="total_vaccinations")
-            .sort_values("date")
-        )
-        eu_manufacturer["total_vaccinations"] = (
-            eu_manufacturer.groupby(["location", "vaccine"]).ffill().total_vaccinations
-        )
-        eu_manufacturer = (
-            eu_manufacturer[eu_manufacturer.date.astype(str) >= "2020-12-27"]
-            .groupby(["date", "vaccine"], as_index=False)
-            .sum()
-            .assign(location="European Union")
+        eu_manufacturer = aggregate(
+            df,
+            {"European Union": {"include": eu_countries}},
+            columns=["total_vaccinations"],
+            ffill=["total_vaccinations"],
+            by=["vaccine"],
         )
+        eu_manufacturer = eu_manufacturer[eu_manufacturer.date.astype(str) >= "2020-12-27"]
         return pd.concat([df, eu_manufacturer])
 
     def pipe_manufacturer_filter_dates(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -656,7 +600,7 @@ class DatasetGenerator:
         df_vaccinations: pd.DataFrame,
         df_manufacturer: pd.DataFrame,
         df_age: pd.DataFrame,
-        json_vaccinations: dict,
+        json_vaccinations: pd.DataFrame,
         df_grapher: pd.DataFrame,
         df_manufacturer_grapher: pd.DataFrame,
         df_age_grapher: pd.DataFrame,
@@ -690,6 +634,8 @@ class DatasetGenerator:
         for obj, path in files:
             if path.endswith(".csv"):
                 obj.to_csv(path, index=False)
+            elif path.endswith(".json") and isinstance(obj, pd.DataFrame):
+                self._write_vaccinations_json(obj, path)
             elif path.endswith(".json"):
                 with open(path, "w") as f:
                     json.dump(obj, f, indent=2)  # default=lambda o: o.__dict__, sort_keys=True
@@ -699,6 +645,31 @@ class DatasetGenerator:
             else:
                 raise ValueError("Format not supported. Currently only csv, json and html are accepted!")
 
+    def _write_vaccinations_json(self, df: pd.DataFrame, path: str):
+        """Write `vaccinations.json`, one location at a time.
+
+        Same output as `json.dump(obj, f, indent=2)`, with `obj` a list with one element per location and ISO code:
+        `{"country": ..., "iso_code": ..., "data": [...]}`. `data` has one object per row, without null values.
+        """
+        metrics = [column for column in df.columns if column not in {"location", "iso_code"}]
+        pad = " " * 2
+        with open(path, "w") as f:
+            f.write("[")
+            groups = df.groupby(["location", "iso_code"], sort=False, dropna=False)
+            for i, ((location, iso_code), df_loc) in enumerate(groups):
+                records = json_objects(df_loc[metrics], indent=2, level=3) if pd.notnull(iso_code) else []
+                records = [r for r in records if r != "{}"]
+                if records:
+                    data = "[" + ",".join(f"\n{pad * 3}{r}" for r in records) + f"\n{pad * 2}]"
+                else:
+                    data = "[]"
+                entry = (
+                    f'{{\n{pad * 2}"country": {json.dumps(location)},\n{pad * 2}"iso_code": {json.dumps(iso_code)},'
+                    f'\n{pad * 2}"data": {data}\n{pad}}}'
+                )
+                f.write(f"{',' if i else ''}\n{pad}{entry}")
+            f.write("\n]" if len(groups) else "]")
+
     def _cp_locations_files(self):
         copyfile(PATHS.INTERNAL_OUTPUT_VAX_META_MANUFACT_FILE, PATHS.DATA_VAX_META_MANUFACT_FILE)
         copyfile(PATHS.INTERNAL_OUTPUT_VAX_META_AGE_FILE, PATHS.DATA_VAX_META_AGE_FILE)
@@ -708,7 +679,7 @@ class DatasetGenerator:
         logger.info("1/10 Loading input data...")
         try:
             df_metadata = pd.read_csv(PATHS.INTERNAL_TMP_VAX_META_FILE)
-            df_vaccinations = pd.read_csv(PATHS.INTERNAL_TMP_VAX_MAIN_FILE, parse_dates=["date"])
+            df_vaccinations = read_table(PATHS.INTERNAL_TMP_VAX_MAIN_FILE)
         except FileNotFoundError:
             raise FileNotFoundError(
                 "Internal files not found! Make sure to run `proccess-data` step prior to running `generate-dataset`."
@@ -2,6 +2,7 @@ import os
 
 import pandas as pd
 from cowidev.gmobility.dtypes import dtype
+from cowidev.utils.web.download import read_csv_from_url
 
 FILE_DS = os.path.join("/tmp", "google-mobility.csv")
 
@@ -10,7 +11,7 @@ class GMobilityETL:
     source_url = "https://www.gstatic.com/covid19/mobility/Global_Mobility_Report.csv"
 
     def extract(self):
-        return pd.read_csv(
+        return read_csv_from_url(
             self.source_url,
             usecols=dtype.keys(),
             # low_memory=False,
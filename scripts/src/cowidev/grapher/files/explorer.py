@@ -1,10 +1,9 @@
-import json
 from dataclasses import dataclass
 from typing import Callable
 
 import pandas as pd
-import numpy as np
 
+from cowidev.utils.io import write_columnar_json
 from cowidev.utils.s3 import obj_from_s3
 
 
@@ -31,35 +30,12 @@ class Exploriser:
             ).reset_index()
         return df
 
-    def pipe_nan_to_none(self, df: pd.DataFrame) -> pd.DataFrame:
-        return df.replace({np.nan: None})
-
-    def pipe_to_dict(self, df: pd.DataFrame) -> pd.DataFrame:
-        return df.to_dict(orient="list")
-
-    def pipeline(self, df: pd.DataFrame) -> dict:
-        df = (
-            df.pipe(self.function_input)
-            .pipe(self.pipe_pivot)
-            .pipe(self.pipe_nan_to_none)
-            .pipe(self.function_output)
-            .pipe(self.pipe_to_dict)
-        )
+    def pipeline(self, df: pd.DataFrame) -> pd.DataFrame:
+        df = df.pipe(self.function_input).pipe(self.pipe_pivot).pipe(self.function_output)
         return df
 
-    def to_json(self, obj):
-        return json.dumps(
-            obj,
-            # Use separators without any trailing whitespace to minimize file size.
-            # The defaults (", ", ": ") contain a trailing space.
-            separators=(",", ":"),
-            # The json library by default encodes NaNs in JSON, but this is invalid JSON.
-            # By having this False, an error will be thrown if a NaN exists in the data.
-            allow_nan=False,
-        )
-
     def run(self, input_path: str, output_path: str):
         df = self.read(input_path)
-        data = df.pipe(self.pipeline)
-        with open(output_path, "w") as f:
-            f.write(self.to_json(data))
+        df = df.pipe(self.pipeline)
+        # Columnar JSON, NaNs written as null
+        write_columnar_json(df, output_path)
@@ -2,6 +2,7 @@ import os
 import time
 import importlib
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 from joblib import Parallel, delayed
 import pandas as pd
@@ -9,14 +10,22 @@ from pandas.api.types import is_string_dtype
 
 from cowidev import PATHS
 from cowidev.utils.log import get_logger
+from cowidev.utils.params import CONFIG
 from cowidev.hosp.sources import __all__ as sources
 
 
-sources = [f"cowidev.hosp.sources.{s}" for s in sources]
+SOURCES_PACKAGE = "cowidev.hosp.sources"
 
 logger = get_logger()
 
 
+def _module_name(source: str) -> str:
+    """Full module name of source `source` (e.g. 'austria' -> 'cowidev.hosp.sources.austria')."""
+    if source.startswith(f"{SOURCES_PACKAGE}."):
+        return source
+    return f"{SOURCES_PACKAGE}.{source}"
+
+
 class HospETL:
     def extract(
         self,
@@ -42,16 +51,26 @@ class HospETL:
         """Collects data for all countries"""
         logger.info("HOSP - Collecting data...")
         if parallel:
-            modules_execution_results = Parallel(n_jobs=n_jobs, backend="threading")(
-                delayed(self._extract_entity)(
-                    source,
-                )
-                for source in sources
-            )
+            # Modules run in threads or processes (joblib's loky backend) as set in the configuration file. Both groups
+            # run at the same time
+            sources_process = [
+                source for source in sources if CONFIG.execution.backend_for(_module_name(source)) == "processes"
+            ]
+            sources_thread = [source for source in sources if source not in sources_process]
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                future = executor.submit(self._extract_parallel, sources_process, n_jobs, "loky")
+                results = dict(zip(sources_thread, self._extract_parallel(sources_thread, n_jobs, "threading")))
+                results.update(zip(sources_process, future.result()))
+            modules_execution_results = [results[source] for source in sources]
         else:
             modules_execution_results = [self._extract_entity(source) for source in sources]
         return modules_execution_results
 
+    def _extract_parallel(self, sources_, n_jobs, backend):
+        if not sources_:
+            return []
+        return Parallel(n_jobs=n_jobs, backend=backend)(delayed(self._extract_entity)(source) for source in sources_)
+
     def extract_export_checkpoint(self, modules_execution_results):
         """Exports downloaded data and metadata."""
         logger.info("HOSP - Saving checkpoint data...")
@@ -122,9 +141,10 @@ class HospETL:
         df_meta = pd.DataFrame.from_records(metadata)
         return df_meta
 
-    def _extract_entity(self, module_name: str):
+    def _extract_entity(self, source: str):
         """Execute the process to get the data for a certain location (country)."""
         t0 = time.time()
+        module_name = _module_name(source)
         module = importlib.import_module(module_name)
         logger.info(f"HOSP - {module_name}: started")
         try:
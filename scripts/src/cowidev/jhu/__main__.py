@@ -29,7 +29,7 @@ from cowidev.jhu.shared import (
 from cowidev.grapher.db.utils.slack_client import send_warning, send_success
 from cowidev.grapher.db.utils.db_imports import import_dataset
 from cowidev import PATHS
-from cowidev.utils.s3 import obj_to_s3
+from cowidev.utils.s3 import obj_to_s3, print_upload_stats
 
 
 INPUT_PATH = PATHS.INTERNAL_INPUT_JHU_DIR
@@ -264,7 +264,9 @@ def export(df_merged):
     df_loc = df_loc.sort_values("location")
     df_loc.to_csv(os.path.join(OUTPUT_PATH, "locations.csv"), index=False)
     # The rest of the CSVs
-    return standard_export(load_standardized(df_merged), OUTPUT_PATH, DATASET_NAME)
+    return standard_export(
+        load_standardized(df_merged), OUTPUT_PATH, DATASET_NAME, table_path=PATHS.INTERNAL_TMP_JHU_FILE
+    )
 
 
 def clean_global_subnational(metric):
@@ -382,6 +384,7 @@ def main(skip_download=False):
 
     print("Generating subnational file…")
     create_subnational()
+    print_upload_stats()
 
 
 def download_csv():
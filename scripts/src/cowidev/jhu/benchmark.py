@@ -0,0 +1,199 @@
+"""Benchmark of the derived JHU metrics against the previous (row-wise) implementation.
+
+Runs both implementations on synthetic data shaped like the JHU dataset (~250 locations x 1000+ days), checks that they
+produce the same CSV output and reports their execution times.
+
+Usage:
+
+    python -m cowidev.jhu.benchmark [--locations 250] [--days 1000]
+"""
+import argparse
+import time
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from cowidev.jhu.shared import (
+    days_since_spec,
+    doubling_days_spec,
+    drop_population,
+    inject_cfr,
+    inject_days_since,
+    inject_doubling_days,
+    inject_exemplars,
+    inject_per_million,
+    inject_population,
+    load_population,
+)
+
+
+# Previous implementation
+
+
+def _legacy_get_date_of_threshold(df, col, threshold):
+    try:
+        return df["date"][df[col] >= threshold].iloc[0]
+    except IndexError:
+        return None
+
+
+def _legacy_date_diff(a, b, positive_only=False):
+    if pd.isnull(a) or pd.isnull(b):
+        return None
+    diff = (a - b).days
+    if positive_only and diff < 0:
+        return None
+    return diff
+
+
+def _legacy_days_since(df, spec):
+    ref_date = pd.to_datetime(_legacy_get_date_of_threshold(df, spec["value_col"], spec["value_threshold"]))
+    return (
+        pd.to_datetime(df["date"])
+        .map(lambda date: _legacy_date_diff(date, ref_date, spec["positive_only"]))
+        .astype("Int64")
+    )
+
+
+def legacy_inject_days_since(df):
+    df = df.copy()
+    for col, spec in days_since_spec.items():
+        df[col] = (
+            df[["date", "location", spec["value_col"]]]
+            .groupby("location")
+            .apply(lambda df_group: _legacy_days_since(df_group, spec))
+            .reset_index(level=0, drop=True)
+        )
+    return df
+
+
+def _legacy_apply_row_cfr_100(row):
+    if pd.notnull(row["total_cases"]) and row["total_cases"] >= 100:
+        return row["cfr"]
+    return pd.NA
+
+
+def legacy_inject_cfr(df):
+    cfr_series = (df["total_deaths"] / df["total_cases"]) * 100
+    df["cfr"] = cfr_series.round(decimals=3)
+    df["cfr_100_cases"] = df.apply(_legacy_apply_row_cfr_100, axis=1)
+    return df
+
+
+def legacy_inject_exemplars(df, testing_locations):
+    df = inject_population(df)
+
+    def mapper_days_since(row):
+        if pd.notnull(row["population"]) and row["population"] >= 5e6:
+            return row["days_since_100_total_cases"]
+        return pd.NA
+
+    df["days_since_100_total_cases_and_5m_pop"] = df.apply(mapper_days_since, axis=1)
+
+    def mapper_bool(row):
+        if (
+            pd.notnull(row["days_since_100_total_cases"])
+            and pd.notnull(row["population"])
+            and row["days_since_100_total_cases"] >= 21
+            and row["population"] >= 5e6
+            and row["location"] in testing_locations
+        ):
+            return 1
+        return 0
+
+    df["5m_pop_and_21_days_since_100_cases_and_testing"] = df.apply(mapper_bool, axis=1)
+    return drop_population(df)
+
+
+def _legacy_pct_change_to_doubling_days(pct_change, periods):
+    if pd.notnull(pct_change) and pct_change != 0:
+        doubling_days = periods * np.log(2) / np.log(1 + pct_change)
+        return np.round(doubling_days, decimals=2)
+    return pd.NA
+
+
+def legacy_inject_doubling_days(df):
+    for col, spec in doubling_days_spec.items():
+        value_col = spec["value_col"]
+        periods = spec["periods"]
+        df.loc[df[value_col] == 0, value_col] = np.nan
+        df[col] = (
+            df.groupby("location", as_index=False)[value_col]
+            .pct_change(periods=periods, fill_method=None)[value_col]
+            .map(lambda pct: _legacy_pct_change_to_doubling_days(pct, periods))
+        )
+    return df
+
+
+# Benchmark
+
+
+def build_data(n_locations: int, n_days: int, seed: int = 0) -> pd.DataFrame:
+    """Build synthetic cumulative cases/deaths, sorted by date (as in `load_standardized`)."""
+    rng = np.random.default_rng(seed)
+    locations = load_population()["location"].drop_duplicates().head(n_locations).tolist()
+    dates = pd.date_range("2020-01-22", periods=n_days).date
+    n = len(locations) * n_days
+    new_cases = rng.poisson(rng.uniform(0, 500, size=n)).astype(float)
+    new_deaths = rng.binomial(new_cases.astype(int), 0.02).astype(float)
+    # Reporting gaps
+    new_cases[rng.random(n) < 0.05] = 0
+    df = pd.DataFrame(
+        {
+            "date": np.tile(dates, len(locations)),
+            "location": np.repeat(locations, n_days),
+            "new_cases": new_cases,
+            "new_deaths": new_deaths,
+        }
+    )
+    df[["total_cases", "total_deaths"]] = df.groupby("location")[["new_cases", "new_deaths"]].cumsum()
+    df.loc[rng.random(n) < 0.01, "total_cases"] = np.nan
+    df = inject_per_million(df, ["total_cases", "total_deaths"])
+    return df.sort_values("date")
+
+
+def _run(steps, df):
+    timings = {}
+    for name, func in steps:
+        t0 = time.perf_counter()
+        df = func(df)
+        timings[name] = time.perf_counter() - t0
+    return df, timings
+
+
+def main(n_locations: int = 250, n_days: int = 1000):
+    df = build_data(n_locations, n_days)
+    print(f"Data: {df.location.nunique()} locations x {n_days} days ({len(df)} rows)")
+    # Synthetic testing data (every other location), so that the testing dataset is not needed
+    testing_locations = set(df["location"].drop_duplicates().iloc[::2])
+    steps_new = [
+        ("inject_doubling_days", inject_doubling_days),
+        ("inject_cfr", inject_cfr),
+        ("inject_days_since", inject_days_since),
+        ("inject_exemplars", partial(inject_exemplars, testing_locations=testing_locations)),
+    ]
+    steps_legacy = [
+        ("inject_doubling_days", legacy_inject_doubling_days),
+        ("inject_cfr", legacy_inject_cfr),
+        ("inject_days_since", legacy_inject_days_since),
+        ("inject_exemplars", partial(legacy_inject_exemplars, testing_locations=testing_locations)),
+    ]
+    df_legacy, t_legacy = _run(steps_legacy, df.copy())
+    df_new, t_new = _run(steps_new, df.copy())
+    # Same output
+    if df_legacy.to_csv(index=False) != df_new.to_csv(index=False):
+        raise AssertionError("Outputs differ!")
+    print(f"{'step':<25}{'legacy (s)':>12}{'new (s)':>12}{'speedup':>10}")
+    for name, _ in steps_new:
+        print(f"{name:<25}{t_legacy[name]:>12.3f}{t_new[name]:>12.3f}{t_legacy[name] / t_new[name]:>9.1f}x")
+    total_legacy, total_new = sum(t_legacy.values()), sum(t_new.values())
+    print(f"{'total':<25}{total_legacy:>12.3f}{total_new:>12.3f}{total_legacy / total_new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--locations", type=int, default=250, help="Number of locations.")
+    parser.add_argument("--days", type=int, default=1000, help="Number of days.")
+    args = parser.parse_args()
+    main(args.locations, args.days)
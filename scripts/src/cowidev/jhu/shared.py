@@ -4,6 +4,8 @@ import os
 from datetime import datetime
 
 from cowidev.megafile.steps.test import get_testing
+from cowidev.utils.aggregates import aggregate
+from cowidev.utils.io import write_table
 from cowidev import PATHS
 
 
@@ -127,26 +129,8 @@ aggregates_spec = {
 }
 
 
-def _sum_aggregate(df, name, include=None, exclude=None):
-    df = df.copy()
-    if include:
-        df = df[df["location"].isin(include)]
-    if exclude:
-        df = df[~df["location"].isin(exclude)]
-    df = df.groupby("date").sum().reset_index()
-    df["location"] = name
-    return df
-
-
 def inject_owid_aggregates(df):
-    return pd.concat(
-        [
-            df,
-            *[_sum_aggregate(df, name, **params) for name, params in aggregates_spec.items()],
-        ],
-        sort=True,
-        ignore_index=True,
-    )
+    return pd.concat([df, aggregate(df, aggregates_spec)], sort=True, ignore_index=True)
 
 
 # =======================
@@ -195,38 +179,24 @@ days_since_spec = {
 }
 
 
-def _get_date_of_threshold(df, col, threshold):
-    try:
-        return df["date"][df[col] >= threshold].iloc[0]
-    except:
-        return None
-
+def _days_since(df, dates, spec):
+    """Days since `spec["value_col"]` first reached `spec["value_threshold"]`, by location.
 
-def _date_diff(a, b, positive_only=False):
-    if pd.isnull(a) or pd.isnull(b):
-        return None
-    diff = (a - b).days
-    if positive_only and diff < 0:
-        return None
-    return diff
-
-
-def _days_since(df, spec):
-    ref_date = pd.to_datetime(_get_date_of_threshold(df, spec["value_col"], spec["value_threshold"]))
-    return (
-        pd.to_datetime(df["date"]).map(lambda date: _date_diff(date, ref_date, spec["positive_only"])).astype("Int64")
-    )
+    Rows are expected to be sorted by date within each location.
+    """
+    dates_reached = dates.where(df[spec["value_col"]] >= spec["value_threshold"])
+    ref_dates = dates_reached.groupby(df["location"]).transform("first")
+    days = (dates - ref_dates).dt.days
+    if spec["positive_only"]:
+        days = days.where(days >= 0)
+    return days.astype("Int64")
 
 
 def inject_days_since(df):
     df = df.copy()
+    dates = pd.to_datetime(df["date"])
     for col, spec in days_since_spec.items():
-        df[col] = (
-            df[["date", "location", spec["value_col"]]]
-            .groupby("location")
-            .apply(lambda df_group: _days_since(df_group, spec))
-            .reset_index(level=0, drop=True)
-        )
+        df[col] = _days_since(df, dates, spec)
     return df
 
 
@@ -235,16 +205,10 @@ def inject_days_since(df):
 # ===================
 
 
-def _apply_row_cfr_100(row):
-    if pd.notnull(row["total_cases"]) and row["total_cases"] >= 100:
-        return row["cfr"]
-    return pd.NA
-
-
 def inject_cfr(df):
     cfr_series = (df["total_deaths"] / df["total_cases"]) * 100
     df["cfr"] = cfr_series.round(decimals=3)
-    df["cfr_100_cases"] = df.apply(_apply_row_cfr_100, axis=1)
+    df["cfr_100_cases"] = df["cfr"].where(df["total_cases"] >= 100)
     return df
 
 
@@ -303,33 +267,23 @@ def inject_rolling_avg(df):
 # ===========================
 
 
-def inject_exemplars(df):
+def inject_exemplars(df, testing_locations: set = None):
+    """Add exemplar variables. `testing_locations` defaults to the locations in the testing dataset."""
     df = inject_population(df)
 
     # Inject days since 100th case IF population ≥ 5M
-    def mapper_days_since(row):
-        if pd.notnull(row["population"]) and row["population"] >= 5e6:
-            return row["days_since_100_total_cases"]
-        return pd.NA
-
-    df["days_since_100_total_cases_and_5m_pop"] = df.apply(mapper_days_since, axis=1)
+    pop_5m = df["population"] >= 5e6
+    df["days_since_100_total_cases_and_5m_pop"] = df["days_since_100_total_cases"].where(pop_5m)
 
     # Inject boolean when all exenplar conditions hold
     # Use int because the Grapher doesn't handle non-ints very well
-    countries_with_testing_data = set(get_testing()["location"])
-
-    def mapper_bool(row):
-        if (
-            pd.notnull(row["days_since_100_total_cases"])
-            and pd.notnull(row["population"])
-            and row["days_since_100_total_cases"] >= 21
-            and row["population"] >= 5e6
-            and row["location"] in countries_with_testing_data
-        ):
-            return 1
-        return 0
-
-    df["5m_pop_and_21_days_since_100_cases_and_testing"] = df.apply(mapper_bool, axis=1)
+    if testing_locations is None:
+        testing_locations = set(get_testing()["location"])
+    df["5m_pop_and_21_days_since_100_cases_and_testing"] = (
+        (df["days_since_100_total_cases"] >= 21).fillna(False).astype(bool)
+        & pop_5m
+        & df["location"].isin(testing_locations)
+    ).astype(int)
 
     return drop_population(df)
 
@@ -359,10 +313,16 @@ doubling_days_spec = {
 
 
 def pct_change_to_doubling_days(pct_change, periods):
-    if pd.notnull(pct_change) and pct_change != 0:
+    """Convert percentage changes over `periods` days to doubling days. NaN where the change is null or zero.
+
+    Args:
+        pct_change (pd.Series): Percentage changes (as fractions).
+        periods (int): Number of days over which changes are computed.
+    """
+    pct_change = pct_change.astype(float).where(pct_change != 0)
+    with np.errstate(divide="ignore"):
         doubling_days = periods * np.log(2) / np.log(1 + pct_change)
-        return np.round(doubling_days, decimals=2)
-    return pd.NA
+    return doubling_days.round(decimals=2)
 
 
 def inject_doubling_days(df):
@@ -370,11 +330,8 @@ def inject_doubling_days(df):
         value_col = spec["value_col"]
         periods = spec["periods"]
         df.loc[df[value_col] == 0, value_col] = np.nan
-        df[col] = (
-            df.groupby("location", as_index=False)[value_col]
-            .pct_change(periods=periods, fill_method=None)[value_col]
-            .map(lambda pct: pct_change_to_doubling_days(pct, periods))
-        )
+        pct_change = df.groupby("location")[value_col].pct_change(periods=periods, fill_method=None)
+        df[col] = pct_change_to_doubling_days(pct_change, periods)
     return df
 
 
@@ -508,7 +465,7 @@ def existsin(l1, l2):
     return [x for x in l1 if x in l2]
 
 
-def standard_export(df, output_path, grapher_name):
+def standard_export(df, output_path, grapher_name, table_path=None):
     # Grapher
     df_grapher = df.copy()
     df_grapher["date"] = pd.to_datetime(df_grapher["date"]).map(lambda date: (date - zero_day).days)
@@ -552,4 +509,12 @@ def standard_export(df, output_path, grapher_name):
         cols = df_pivot.columns.tolist()
         cols.insert(0, cols.pop(cols.index("World")))
         df_pivot[cols].to_csv(os.path.join(output_path, "%s.csv" % col_name))
+    # Long format, for internal use (read by the megafile instead of the wide files above)
+    if table_path is not None:
+        write_table(
+            df_table[["location", "date", *BASE_MEASURES, *PER_MILLION_MEASURES]].assign(
+                date=lambda x: x.date.astype(str)
+            ),
+            table_path,
+        )
     return True
@@ -0,0 +1,141 @@
+"""Benchmark of megafile steps against their previous implementations.
+
+    - `merge_sources` (integer-keyed alignment) against chained merges.
+    - `add_rolling_vaccinations` (all locations at once) against `groupby("location").apply`.
+
+Runs both implementations of each step on synthetic data shaped like the megafile inputs (~250 locations x 1000+
+days), checks that they produce the same frame and reports their execution times and peak memory (allocations traced
+with `tracemalloc`).
+
+Usage:
+
+    python -m cowidev.megafile.benchmark [--locations 250] [--days 1000]
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from cowidev.megafile.steps.core import SOURCES_LEFT, SOURCES_OUTER, _merge_sources_chained, merge_sources
+from cowidev.megafile.steps.vax import add_rolling_vaccinations
+
+
+# Number of value columns and share of location-dates covered, by source
+SOURCES_SHAPE = {
+    "jhu": (14, 0.95),
+    "reprod": (1, 0.8),
+    "hosp": (8, 0.3),
+    "testing": (10, 0.5),
+    "vax": (12, 0.6),
+    "cgrt": (1, 0.9),
+    "variants": (1, 0.2),
+}
+
+
+def build_sources(n_locations: int, n_days: int, seed: int = 0) -> dict:
+    """Build synthetic sources (see `cowidev.megafile.steps.load_sources`)."""
+    rng = np.random.default_rng(seed)
+    locations = np.array([f"Location {i:03d}" for i in range(n_locations)], dtype=object)
+    dates = pd.date_range("2020-01-22", periods=n_days).strftime("%Y-%m-%d").to_numpy(dtype=object)
+    sources = {}
+    for name, (n_columns, coverage) in SOURCES_SHAPE.items():
+        loc, day = np.meshgrid(np.arange(n_locations), np.arange(n_days), indexing="ij")
+        msk = rng.random(loc.size) < coverage
+        df = pd.DataFrame({"location": locations[loc.ravel()[msk]], "date": dates[day.ravel()[msk]]})
+        for i in range(n_columns):
+            df[f"{name}_{i}"] = rng.uniform(0, 1e6, size=len(df)).round(3)
+        # Sources are not sorted by location
+        sources[name] = df.sample(frac=1, random_state=seed).reset_index(drop=True)
+    return sources
+
+
+def build_vax(n_locations: int, n_days: int, seed: int = 0) -> pd.DataFrame:
+    """Build synthetic total vaccinations, with gaps, and locations starting and ending reporting on different days."""
+    rng = np.random.default_rng(seed)
+    dfs = []
+    for i in range(n_locations):
+        total_vaccinations = rng.poisson(rng.uniform(0, 1e5), size=n_days).cumsum().astype(float)
+        total_vaccinations[: rng.integers(0, n_days)] = np.nan
+        total_vaccinations[n_days - rng.integers(0, n_days // 4) :] = np.nan
+        total_vaccinations[rng.random(n_days) < 0.3] = np.nan
+        dfs.append(
+            pd.DataFrame(
+                {
+                    "location": f"Location {i:03d}",
+                    "date": pd.date_range("2020-01-22", periods=n_days).strftime("%Y-%m-%d"),
+                    "total_vaccinations": total_vaccinations,
+                    "population": float(rng.integers(10_000, 1_000_000_000)),
+                }
+            )
+        )
+    # Rows are not sorted by location
+    return pd.concat(dfs, ignore_index=True).sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def _legacy_add_rolling(df: pd.DataFrame) -> pd.DataFrame:
+    last_known_date = df.loc[df.total_vaccinations.notnull(), "date"].max()
+    for n_months in (6, 9, 12):
+        n_days = round(365.2425 * n_months / 12)
+        df[f"rolling_vaccinations_{n_months}m"] = (
+            df.total_vaccinations.interpolate(method="linear").diff().rolling(n_days, min_periods=1).sum().round()
+        )
+        df.loc[df.date > last_known_date, f"rolling_vaccinations_{n_months}m"] = np.NaN
+        df[f"rolling_vaccinations_{n_months}m_per_hundred"] = (
+            df[f"rolling_vaccinations_{n_months}m"] * 100 / df.population
+        ).round(2)
+    return df
+
+
+def legacy_add_rolling_vaccinations(df: pd.DataFrame) -> pd.DataFrame:
+    return df.groupby("location").apply(_legacy_add_rolling).reset_index(drop=True)
+
+
+def _run(func, sources):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    df = func(sources)
+    t = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, t, peak
+
+
+def _report(name_legacy, results_legacy, name_new, results_new):
+    _, t_legacy, mem_legacy = results_legacy
+    _, t_new, mem_new = results_new
+    print(f"{'':<26}{'time (s)':>12}{'peak (MB)':>12}")
+    print(f"{name_legacy:<26}{t_legacy:>12.3f}{mem_legacy / 1e6:>12.1f}")
+    print(f"{name_new:<26}{t_new:>12.3f}{mem_new / 1e6:>12.1f}")
+    print(f"{'ratio':<26}{t_legacy / t_new:>11.1f}x{mem_legacy / mem_new:>11.1f}x")
+
+
+def main(n_locations: int = 250, n_days: int = 1000):
+    # merge_sources
+    sources = build_sources(n_locations, n_days)
+    n_rows = sum(len(sources[name]) for name in SOURCES_OUTER + SOURCES_LEFT)
+    print(f"Data: {n_locations} locations x {n_days} days ({n_rows} rows over {len(sources)} sources)")
+    results_chained = _run(_merge_sources_chained, sources)
+    results_new = _run(merge_sources, sources)
+    # Same output
+    pd.testing.assert_frame_equal(results_chained[0].reset_index(drop=True), results_new[0])
+    _report("chained merges", results_chained, "merge_sources", results_new)
+
+    # add_rolling_vaccinations
+    vax = build_vax(n_locations, n_days)
+    n_rows = vax.total_vaccinations.notnull().sum()
+    print(f"\nData: {n_locations} locations x {n_days} days ({n_rows} rows with total vaccinations)")
+    results_legacy = _run(legacy_add_rolling_vaccinations, vax.copy())
+    results_new = _run(add_rolling_vaccinations, vax.copy())
+    # Same output
+    pd.testing.assert_frame_equal(results_legacy[0], results_new[0])
+    _report("groupby.apply", results_legacy, "add_rolling_vaccinations", results_new)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--locations", type=int, default=250, help="Number of locations.")
+    parser.add_argument("--days", type=int, default=1000, help="Number of days.")
+    args = parser.parse_args()
+    main(args.locations, args.days)
@@ -0,0 +1,56 @@
+"""Concurrent execution of megafile steps.
+
+Steps are defined by name, each with the function that runs it and the steps it depends on:
+
+    {
+        "jhu": (get_jhu, []),
+        "vax": (get_vax, []),
+        "merge": (merge, ["jhu", "vax"]),
+    }
+
+A step starts as soon as all its dependencies are done, and is given their results. Independent steps (e.g. loading
+datasets, often network-bound) run concurrently on a thread pool.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def run_steps(steps: dict, max_workers: int = None) -> dict:
+    """Run `steps`, each as soon as its dependencies are done. The duration of each step is printed.
+
+    Args:
+        steps (dict): Steps, by name. Each step is a tuple `(func, dependencies)`: `func` is called with the results of
+                        the steps named in `dependencies` (list), in that order.
+        max_workers (int, optional): Maximum number of steps running at once. Defaults to None (no limit).
+
+    Returns:
+        dict: Result of each step, by name (in the same order as `steps`).
+    """
+    unknown = {dep for _, dependencies in steps.values() for dep in dependencies} - set(steps)
+    if unknown:
+        raise ValueError(f"Unknown step dependencies: {unknown}")
+    results = {}
+    pending = dict(steps)
+    running = {}
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers or len(steps)) as executor:
+        while pending or running:
+            for name, (func, dependencies) in list(pending.items()):
+                if all(dep in results for dep in dependencies):
+                    del pending[name]
+                    running[executor.submit(_run_timed, func, *[results[dep] for dep in dependencies])] = name
+            if not running:
+                raise ValueError(f"Circular step dependencies: {list(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name], duration = future.result()
+                print(f"Step {name} done in {duration:.1f} s")
+    print(f"All steps done in {time.perf_counter() - t0:.1f} s")
+    return {name: results[name] for name in steps}
+
+
+def _run_timed(func, *args):
+    t0 = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - t0
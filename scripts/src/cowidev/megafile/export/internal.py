@@ -1,10 +1,11 @@
 import os
 
+from joblib import Parallel, delayed
 import pandas as pd
 import numpy as np
 
 from cowidev.megafile.export.annotations import AnnotatorInternal, add_annotations_countries_100_percentage
-from cowidev.utils.utils import dict_to_compact_json
+from cowidev.utils.io import write_columnar_json
 
 
 COUNTRIES_WITH_PARTLY_VAX_METRIC = []
@@ -196,7 +197,7 @@ internal_files_columns = {
 }
 
 
-def create_internal(df: pd.DataFrame, output_dir: str, annotations_path: str, country_data: str):
+def create_internal(df: pd.DataFrame, output_dir: str, annotations_path: str, country_data: str, n_jobs: int = -1):
     # Ensure internal/ dir is created
     os.makedirs(output_dir, exist_ok=True)
 
@@ -207,18 +208,19 @@ def create_internal(df: pd.DataFrame, output_dir: str, annotations_path: str, co
     # Load annotations
     annotator = AnnotatorInternal.from_yaml(annotations_path)
 
-    # Copy df
-    df = df.copy()
+    # Shallow copy: new columns are added to this frame only, without copying the data of `df`
+    df = df.copy(deep=False)
 
     # Add new annotations for countries having >100% per-capita metric values (runtime, not stored in ANNOTATIONS_PATH)
     annotator = add_annotations_countries_100_percentage(df, annotator)
     # Insert CFR column to avoid calculating it on the client, and enable
     # splitting up into cases & deaths columns.
-    df["cfr"] = (df["total_deaths"] * 100 / df["total_cases"]).round(3)
+    # Columns may be float32 (see `compact_dtypes`), metrics are computed in float64
+    df["cfr"] = (df["total_deaths"].astype(float) * 100 / df["total_cases"]).round(3)
 
     # Insert short-term CFR
     cfr_day_shift = 10  # We compute number of deaths divided by number of cases `cfr_day_shift` days before.
-    shifted_cases = df.sort_values("date").groupby("location")["new_cases_smoothed"].shift(cfr_day_shift)
+    shifted_cases = df.sort_values("date").groupby("location")["new_cases_smoothed"].shift(cfr_day_shift).astype(float)
     df["cfr_short_term"] = (
         df["new_deaths_smoothed"].div(shifted_cases).replace(np.inf, np.nan).replace(-np.inf, np.nan).mul(100).round(4)
     )
@@ -234,6 +236,7 @@ def create_internal(df: pd.DataFrame, output_dir: str, annotations_path: str, co
     df = df.pipe(add_total_vaccinations_no_boosters)
 
     # Export
+    outputs = []
     for name, config in internal_files_columns.items():
         output_path = os.path.join(output_dir, f"megafile--{name}.json")
         value_columns = list(set(config["columns"]) - set(non_value_columns))
@@ -242,7 +245,9 @@ def create_internal(df: pd.DataFrame, output_dir: str, annotations_path: str, co
             df_output = df_output.copy().pipe(fillna_boosters_till_valid)
         df_output = df_output.dropna(subset=value_columns, how=config["dropna"])
         df_output = annotator.add_annotations(df_output, name)
-        df_to_columnar_json(df_output, output_path)
+        outputs.append((df_output, output_path))
+    # Files are written in parallel (set n_jobs=1 to write them sequentially)
+    Parallel(n_jobs=n_jobs)(delayed(df_to_columnar_json)(df_output, output_path) for df_output, output_path in outputs)
 
 
 def add_partially_vaccinated(df: pd.DataFrame, country_data: str):
@@ -305,10 +310,5 @@ def df_to_columnar_json(complete_dataset, output_path):
             "date": ["2020-03-01", "2020-03-02", ... ]
         }
     """
-    # Replace NaNs with None in order to be serializable to JSON.
-    # JSON doesn't support NaNs, but it does have null which is represented as None in Python.
-    columnar_dict = complete_dataset.to_dict(orient="list")
-    for k, v in columnar_dict.items():
-        columnar_dict[k] = [x if pd.notnull(x) else None for x in v]
-    with open(output_path, "w") as file:
-        file.write(dict_to_compact_json(columnar_dict))
+    # NaNs are written as null (JSON doesn't support NaNs)
+    write_columnar_json(complete_dataset, output_path)
@@ -1,66 +1,85 @@
+import json
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
 
 import pandas as pd
 
 from cowidev import PATHS
-from cowidev.utils.s3 import S3, obj_to_s3
-from cowidev.utils.utils import dict_to_compact_json
+from cowidev.utils.io import json_objects, write_xlsx
+from cowidev.utils.s3 import get_s3
+from cowidev.utils.utils import dict_to_compact_json, latest_values
 
 
 DATA_DIR = PATHS.DATA_DIR
 
 
-def create_dataset(df, macro_variables):
-    """Export dataset as CSV, XLSX and JSON (complete time series)."""
-    print("Writing to CSV…")
-    filename = os.path.join(DATA_DIR, "owid-covid-data.csv")
-    df.to_csv(filename, index=False)
-    S3().upload_to_s3(filename, "s3://covid-19/public/owid-covid-data.csv", public=True)
-
-    print("Writing to XLSX…")
-    # filename = os.path.join(DATA_DIR, "owid-covid-data.xlsx")
-    # all_covid.to_excel(os.path.join(DATA_DIR, "owid-covid-data.xlsx"), index=False, engine="xlsxwriter")
-    # upload_to_s3(filename, "public/owid-covid-data.xlsx", public=True)
-    obj_to_s3(df, s3_path="s3://covid-19/public/owid-covid-data.xlsx", public=True)
+def create_dataset(df, macro_variables, attributes=None):
+    """Export dataset as CSV, XLSX and JSON (complete time series).
 
-    print("Writing to JSON…")
-    data = df_to_dict(
-        df,
-        macro_variables.keys(),
-        valid_json=True,
-    )
-    obj_to_s3(data, "s3://covid-19/public/owid-covid-data.json", public=True)
+    The three files are written concurrently, and then uploaded at once. If given, the static columns of the JSON are
+    read from the `attributes` table (see `cowidev.megafile.steps.attributes`).
+    """
+    filename = os.path.join(DATA_DIR, "owid-covid-data.csv")
+    with tempfile.TemporaryDirectory() as tmp:
+        filename_xlsx = os.path.join(tmp, "owid-covid-data.xlsx")
+        filename_json = os.path.join(tmp, "owid-covid-data.json")
+        print("Writing to CSV, XLSX and JSON…")
+        with ThreadPoolExecutor() as executor:
+            futures = [
+                executor.submit(df.to_csv, filename, index=False),
+                executor.submit(write_xlsx, df, filename_xlsx),
+                executor.submit(df_to_json, df, filename_json, macro_variables.keys(), attributes),
+            ]
+        for future in futures:
+            future.result()
+
+        # Upload all files at once
+        get_s3().upload_many(
+            [filename, filename_xlsx, filename_json],
+            [
+                "s3://covid-19/public/owid-covid-data.csv",
+                "s3://covid-19/public/owid-covid-data.xlsx",
+                "s3://covid-19/public/owid-covid-data.json",
+            ],
+            public=True,
+        )
 
 
 def create_latest(df):
     """Export dataset as CSV, XLSX and JSON (latest data points)."""
     df = df[df.date >= str(date.today() - timedelta(weeks=2))]
-    df = df.sort_values("date")
 
-    latest = [df[df.location == loc].ffill().tail(1).round(3) for loc in set(df.location)]
-    latest = pd.concat(latest)
-    latest = latest.sort_values("location").rename(columns={"date": "last_updated_date"})
+    # Last non-null value of each column, by location
+    latest = latest_values(df, by="location", sort_by="date").round(3)
+    latest = latest.rename(columns={"date": "last_updated_date"})
 
     print("Writing latest version…")
-    # CSV
-    latest.to_csv(os.path.join(DATA_DIR, "latest", "owid-covid-latest.csv"), index=False)
-    S3().upload_to_s3(
-        os.path.join(DATA_DIR, "latest", "owid-covid-latest.csv"),
-        "s3://covid-19/public/latest/owid-covid-latest.csv",
-        public=True,
-    )
-    # XLSX
-    obj_to_s3(latest, s3_path="s3://covid-19/public/latest/owid-covid-latest.xlsx", public=True)
-    # JSON
-    latest.dropna(subset=["iso_code"]).set_index("iso_code").to_json(
-        os.path.join(DATA_DIR, "latest", "owid-covid-latest.json"), orient="index"
-    )
-    S3().upload_to_s3(
-        os.path.join(DATA_DIR, "latest", "owid-covid-latest.json"),
-        "s3://covid-19/public/latest/owid-covid-latest.json",
-        public=True,
-    )
+    with tempfile.TemporaryDirectory() as tmp:
+        # CSV
+        latest.to_csv(os.path.join(DATA_DIR, "latest", "owid-covid-latest.csv"), index=False)
+        # XLSX
+        filename_xlsx = os.path.join(tmp, "owid-covid-latest.xlsx")
+        write_xlsx(latest, filename_xlsx)
+        # JSON
+        latest.dropna(subset=["iso_code"]).set_index("iso_code").to_json(
+            os.path.join(DATA_DIR, "latest", "owid-covid-latest.json"), orient="index"
+        )
+        # Upload all files at once
+        get_s3().upload_many(
+            [
+                os.path.join(DATA_DIR, "latest", "owid-covid-latest.csv"),
+                filename_xlsx,
+                os.path.join(DATA_DIR, "latest", "owid-covid-latest.json"),
+            ],
+            [
+                "s3://covid-19/public/latest/owid-covid-latest.csv",
+                "s3://covid-19/public/latest/owid-covid-latest.xlsx",
+                "s3://covid-19/public/latest/owid-covid-latest.json",
+            ],
+            public=True,
+        )
 
 
 def df_to_dict(complete_dataset, static_columns, valid_json=False):
@@ -88,12 +107,41 @@ def df_to_dict(complete_dataset, static_columns, valid_json=False):
     return megajson
 
 
-def df_to_json(complete_dataset, output_path, static_columns):
+def df_to_json(complete_dataset, output_path, static_columns, attributes=None):
     """
     Writes a JSON version of the complete dataset, with the ISO code at the root.
     NA values are dropped from the output.
     Macro variables are normalized by appearing only once, at the root of each ISO code.
+
+    Same output as `df_to_dict(..., valid_json=True)`, but written one country at a time. Static data is read from
+    `attributes` if given (one row per location), instead of from the first row of each country.
     """
-    megajson = df_to_dict(complete_dataset, static_columns, valid_json=True)
+    static_columns = ["continent", "location"] + list(static_columns)
+
+    complete_dataset = complete_dataset.dropna(axis="rows", subset=["iso_code"])
+    if attributes is not None:
+        static_json = _static_json(complete_dataset, attributes, static_columns)
+
     with open(output_path, "w") as file:
-        file.write(megajson)
+        file.write("{")
+        for i, (iso, country_df) in enumerate(complete_dataset.groupby("iso_code", sort=False, observed=True)):
+            country_df = country_df.drop(columns=["iso_code"])
+            if attributes is not None:
+                static_data = static_json[iso]
+            else:
+                static_data = json_objects(country_df.head(1)[static_columns], allow_nan=False)[0]
+            records = json_objects(country_df.drop(columns=static_columns), allow_nan=False)
+            # Add "data" field to static data object
+            static_data = static_data[:-1] + ("," if static_data != "{}" else "")
+            file.write(f"{',' if i else ''}{json.dumps(iso)}:{static_data}\"data\":[{','.join(records)}]}}")
+        file.write("}")
+
+
+def _static_json(complete_dataset, attributes, static_columns):
+    """Static data of each ISO code (JSON object), as found in the first row of its country in `complete_dataset`."""
+    # First location of each country (the dataset is sorted by location)
+    attributes = attributes[attributes.location.isin(complete_dataset.location.unique())]
+    attributes = attributes.sort_values("location").drop_duplicates(subset=["iso_code"])
+    # Same types as in the dataset (e.g. integer variables with missing values are floats)
+    static = attributes[static_columns].astype(complete_dataset[static_columns].dtypes.to_dict())
+    return dict(zip(attributes["iso_code"], json_objects(static, allow_nan=False)))
@@ -1,13 +1,21 @@
 import os
+import resource
+import sys
 from datetime import date
 
 import pandas as pd
 
-from cowidev.utils.utils import export_timestamp
+from cowidev.utils.s3 import print_upload_stats
+from cowidev.utils.utils import compact_dtypes, export_timestamp
 from cowidev import PATHS
+from cowidev.megafile.dag import run_steps
+from cowidev.megafile.incremental import IncrementalBuild
 from cowidev.megafile.steps import (
-    get_base_dataset,
-    add_macro_variables,
+    load_sources,
+    merge_sources,
+    load_attributes,
+    add_attributes,
+    load_excess_mortality,
     add_excess_mortality,
     add_rolling_vaccinations,
 )
@@ -26,69 +34,135 @@ DATA_VAX_COUNTRIES_DIR = PATHS.DATA_VAX_COUNTRY_DIR
 ANNOTATIONS_PATH = PATHS.INTERNAL_INPUT_OWID_ANNOTATIONS_FILE
 README_TMP = PATHS.INTERNAL_INPUT_OWID_READ_FILE
 README_FILE = PATHS.DATA_READ_FILE
+INCREMENTAL_DIR = os.path.join(PATHS.INTERNAL_TMP_DIR, "megafile")
+ATTRIBUTES_DIR = os.path.join(PATHS.INTERNAL_TMP_DIR, "megafile-attributes")
+
+# Macro variables
+# - the key is the name of the variable of interest
+# - the value is the path to the corresponding file
+MACRO_VARIABLES = {
+    "population": "un/population_latest.csv",
+    "population_density": "wb/population_density.csv",
+    "median_age": "un/median_age.csv",
+    "aged_65_older": "wb/aged_65_older.csv",
+    "aged_70_older": "un/aged_70_older.csv",
+    "gdp_per_capita": "wb/gdp_per_capita.csv",
+    "extreme_poverty": "wb/extreme_poverty.csv",
+    "cardiovasc_death_rate": "gbd/cardiovasc_death_rate.csv",
+    "diabetes_prevalence": "wb/diabetes_prevalence.csv",
+    "female_smokers": "wb/female_smokers.csv",
+    "male_smokers": "wb/male_smokers.csv",
+    "handwashing_facilities": "un/handwashing_facilities.csv",
+    "hospital_beds_per_thousand": "owid/hospital_beds.csv",
+    "life_expectancy": "owid/life_expectancy.csv",
+    "human_development_index": "un/human_development_index.csv",
+}
+XM_WMD_HMD_FILE = os.path.join(DATA_DIR, "excess_mortality", "excess_mortality.csv")
+XM_ECONOMIST_FILE = os.path.join(DATA_DIR, "excess_mortality", "excess_mortality_economist_estimates.csv")
+# Columns stored as categorical in lean mode (see `compact_dtypes`). Dates are kept as strings (not as integer day
+# keys), so that they can still be compared with strings (e.g. `df.date >= "2021-01-01"`).
+CATEGORICAL_COLUMNS = ["iso_code", "continent", "location", "tests_units"]
+
+
+def generate_megafile(incremental: bool = False, lean: bool = False, max_rss: int = None):
+    """Generate megafile data.
+
+    Args:
+        incremental (bool, optional): Only recompute the locations whose input data changed since the last incremental
+                                        run (see `cowidev.megafile.incremental`). If no input changed, nothing is
+                                        exported. Defaults to False.
+        lean (bool, optional): Export from a frame with compact dtypes (see `compact_dtypes`), to reduce peak memory.
+                                Exported files are the same. Defaults to False.
+        max_rss (int, optional): Raise an error if the peak memory (RSS) of the process exceeds this value, in MB.
+                                    Meant for a memory-ceiling check, e.g. `cowid megafile --lean --max-rss 3000`. No
+                                    CI job runs it yet: the megafile needs the full input data and S3. Defaults to
+                                    None.
+    """
+    sources = load_sources()
+    if incremental:
+        build = IncrementalBuild(cache_dir=INCREMENTAL_DIR, static_files=_static_files())
+        all_covid = build.run(sources, build_dataset)
+        if all_covid is None:
+            print("No input changed since last build, nothing to export.")
+            return
+    else:
+        all_covid = build_dataset(sources)
+
+    if lean:
+        memory = all_covid.memory_usage(deep=True).sum()
+        all_covid = compact_dtypes(all_covid, categorical=CATEGORICAL_COLUMNS)
+        print(f"Compact dtypes: {memory / 2**20:.0f} MB → {all_covid.memory_usage(deep=True).sum() / 2**20:.0f} MB")
+
+    export_dataset(all_covid)
+
+    if incremental:
+        build.commit()
+
+    rss = _peak_rss()
+    print(f"Peak memory (RSS): {rss:.0f} MB")
+    if max_rss is not None and rss > max_rss:
+        raise Exception(f"Peak memory (RSS) of {rss:.0f} MB exceeds the maximum of {max_rss} MB")
 
+    print("All done!")
+
+
+def _peak_rss() -> float:
+    """Peak memory (RSS) of the process, in MB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes on Linux
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
 
-def generate_megafile():
-    """Generate megafile data."""
-    all_covid = get_base_dataset()
+
+def _static_files():
+    """Input files shared by all locations."""
+    return [
+        PATHS.INTERNAL_INPUT_ISO_FILE,
+        PATHS.INTERNAL_INPUT_OWID_CONT_FILE,
+        XM_WMD_HMD_FILE,
+        XM_ECONOMIST_FILE,
+    ] + [os.path.join(INPUT_DIR, file) for file in MACRO_VARIABLES.values()]
+
+
+def _merge_sources(sources: dict) -> pd.DataFrame:
+    all_covid = merge_sources(sources)
 
     # Remove today's datapoint
     all_covid = all_covid[all_covid["date"] < str(date.today())]
 
     # Exclude some entities from megafile
     excluded = ["Summer Olympics 2020", "Winter Olympics 2022"]
-    all_covid = all_covid[-all_covid.location.isin(excluded)]
+    return all_covid[-all_covid.location.isin(excluded)]
 
-    # Add ISO codes
-    print("Adding ISO codes…")
-    iso_codes = pd.read_csv(PATHS.INTERNAL_INPUT_ISO_FILE)
 
-    missing_iso = set(all_covid.location).difference(set(iso_codes.location))
-    if len(missing_iso) > 0:
-        print(missing_iso)
-        raise Exception("Missing ISO code for some locations")
+def _load_attributes():
+    """Static attributes of each location (see `cowidev.megafile.steps.attributes`)."""
+    return load_attributes(
+        iso_file=PATHS.INTERNAL_INPUT_ISO_FILE,
+        continents_file=PATHS.INTERNAL_INPUT_OWID_CONT_FILE,
+        macro_variables=MACRO_VARIABLES,
+        data_dir=INPUT_DIR,
+        cache_dir=ATTRIBUTES_DIR,
+    )
 
-    all_covid = iso_codes.merge(all_covid, on="location")
 
-    # Add continents
-    print("Adding continents…")
-    continents = pd.read_csv(
-        PATHS.INTERNAL_INPUT_OWID_CONT_FILE,
-        names=["_1", "iso_code", "_2", "continent"],
-        usecols=["iso_code", "continent"],
-        header=0,
-    )
+def build_dataset(sources: dict) -> pd.DataFrame:
+    """Build megafile from input datasets (see `cowidev.megafile.steps.load_sources`).
 
-    all_covid = continents.merge(all_covid, on="iso_code", how="right")
-
-    # Add macro variables
-    # - the key is the name of the variable of interest
-    # - the value is the path to the corresponding file
-    macro_variables = {
-        "population": "un/population_latest.csv",
-        "population_density": "wb/population_density.csv",
-        "median_age": "un/median_age.csv",
-        "aged_65_older": "wb/aged_65_older.csv",
-        "aged_70_older": "un/aged_70_older.csv",
-        "gdp_per_capita": "wb/gdp_per_capita.csv",
-        "extreme_poverty": "wb/extreme_poverty.csv",
-        "cardiovasc_death_rate": "gbd/cardiovasc_death_rate.csv",
-        "diabetes_prevalence": "wb/diabetes_prevalence.csv",
-        "female_smokers": "wb/female_smokers.csv",
-        "male_smokers": "wb/male_smokers.csv",
-        "handwashing_facilities": "un/handwashing_facilities.csv",
-        "hospital_beds_per_thousand": "owid/hospital_beds.csv",
-        "life_expectancy": "owid/life_expectancy.csv",
-        "human_development_index": "un/human_development_index.csv",
+    Sources are merged while static attributes and excess mortality data are loaded (see `cowidev.megafile.dag`).
+    """
+    steps = {
+        "merge_sources": (lambda: _merge_sources(sources), []),
+        "load_attributes": (_load_attributes, []),
+        "load_excess_mortality": (lambda: load_excess_mortality(XM_WMD_HMD_FILE, XM_ECONOMIST_FILE), []),
     }
-    all_covid = add_macro_variables(all_covid, macro_variables, INPUT_DIR)
+    all_covid, attributes, excess_mortality = run_steps(steps).values()
+
+    # Add ISO codes, continents and macro variables
+    print("Adding ISO codes, continents and macro variables…")
+    all_covid = add_attributes(all_covid, attributes)
 
     # Add excess mortality
-    all_covid = add_excess_mortality(
-        df=all_covid,
-        wmd_hmd_file=os.path.join(DATA_DIR, "excess_mortality", "excess_mortality.csv"),
-        economist_file=os.path.join(DATA_DIR, "excess_mortality", "excess_mortality_economist_estimates.csv"),
-    )
+    all_covid = add_excess_mortality(all_covid, excess_mortality)
 
     # Calculate rolling vaccinations
     all_covid = add_rolling_vaccinations(all_covid)
@@ -99,6 +173,11 @@ def generate_megafile():
     # Check that we only have 1 unique row for each location/date pair
     assert all_covid.drop_duplicates(subset=["location", "date"]).shape == all_covid.shape
 
+    return all_covid
+
+
+def export_dataset(all_covid: pd.DataFrame):
+    """Export megafile and derived files (internal, latest, README, etc.)."""
     print("Creating internal files…")
     create_internal(
         df=all_covid,
@@ -138,7 +217,8 @@ def generate_megafile():
     create_latest(all_covid)
 
     # Create datasets
-    create_dataset(all_covid, macro_variables)
+    create_dataset(all_covid, MACRO_VARIABLES, attributes=_load_attributes())
+    print_upload_stats()
 
     # Store the last updated time
     export_timestamp(PATHS.DATA_TIMESTAMP_OLD_FILE, force_directory=PATHS.DATA_DIR)  # @deprecate
@@ -153,5 +233,3 @@ def generate_megafile():
 
     # Export timestamp
     export_timestamp(PATHS.DATA_TIMESTAMP_ROOT_FILE)
-
-    print("All done!")
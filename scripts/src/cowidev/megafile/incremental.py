@@ -0,0 +1,183 @@
+"""Incremental build of the megafile.
+
+Each input dataset is fingerprinted per location. The megafile rows of each location are persisted (one file per
+location, see `cowidev.utils.io.write_table`) together with their fingerprints, so that the next run only recomputes
+the locations whose inputs changed. The rest are loaded from the previous run.
+
+Inputs shared by all locations (ISO codes, continents, macro variables, excess mortality files) are fingerprinted as
+a whole: if any of them changes, or the day changes (today's data points are removed from the megafile), all locations
+are recomputed.
+"""
+import hashlib
+import json
+import os
+from datetime import date
+
+import pandas as pd
+
+from cowidev.megafile.steps.core import SOURCES_OUTER
+from cowidev.utils.io import read_table, write_table
+
+
+STATE_VERSION = 2
+"""Bump to invalidate persisted builds (e.g. when the megafile logic changes)."""
+
+
+class IncrementalBuild:
+    """Incremental megafile build.
+
+    Args:
+        cache_dir (str): Folder where the per-location megafile rows and fingerprints are stored.
+        static_files (list): Paths to input files shared by all locations.
+    """
+
+    def __init__(self, cache_dir: str, static_files: list):
+        self.cache_dir = cache_dir
+        self.static_files = static_files
+        self._pending = None
+
+    @property
+    def _state_path(self):
+        return os.path.join(self.cache_dir, "state.json")
+
+    def _partition_path(self, filename):
+        return os.path.join(self.cache_dir, filename)
+
+    def _load_state(self):
+        try:
+            with open(self._state_path) as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if state.get("version") != STATE_VERSION:
+            return None
+        return state
+
+    def fingerprint_global(self) -> str:
+        """Fingerprint of the inputs shared by all locations."""
+        sha = hashlib.sha1(f"{STATE_VERSION}-{date.today()}".encode())
+        for path in sorted(self.static_files):
+            with open(path, "rb") as f:
+                sha.update(hashlib.sha1(f.read()).digest())
+        return sha.hexdigest()
+
+    def fingerprint_locations(self, sources: dict) -> dict:
+        """Fingerprint of the input data of each location.
+
+        Only locations in the megafile (i.e. in any of `SOURCES_OUTER`) are fingerprinted.
+
+        Args:
+            sources (dict): Input datasets, by source name (see `cowidev.megafile.steps.load_sources`).
+
+        Returns:
+            dict: Fingerprint by location.
+        """
+        locations = set().union(*(sources[name]["location"].unique() for name in SOURCES_OUTER))
+        shas = {}
+        for name, df in sorted(sources.items()):
+            hashes = pd.util.hash_pandas_object(df, index=False).values
+            for location, idx in df.groupby("location").indices.items():
+                if location not in locations:
+                    continue
+                if location not in shas:
+                    shas[location] = hashlib.sha1()
+                shas[location].update(name.encode())
+                shas[location].update(hashes[idx].tobytes())
+        return {location: sha.hexdigest() for location, sha in shas.items()}
+
+    def run(self, sources: dict, build_dataset) -> pd.DataFrame:
+        """Build the megafile, only recomputing the locations whose inputs changed.
+
+        Call `commit` once the megafile has been exported, to persist the build.
+
+        Args:
+            sources (dict): Input datasets, by source name (see `cowidev.megafile.steps.load_sources`).
+            build_dataset (callable): Function building the megafile from (a subset of) `sources`.
+
+        Returns:
+            pd.DataFrame: Megafile. None if no input changed since last build.
+        """
+        state = self._load_state()
+        fp_global = self.fingerprint_global()
+        fp_locations = self.fingerprint_locations(sources)
+        locations_old = state["locations"] if state is not None else {}
+        if state is None or state["global"] != fp_global:
+            changed = set(fp_locations)
+        else:
+            changed = {
+                location
+                for location, fp in fp_locations.items()
+                if location not in locations_old
+                or locations_old[location]["fingerprint"] != fp
+                or (
+                    locations_old[location]["file"] is not None
+                    and not os.path.isfile(self._partition_path(locations_old[location]["file"]))
+                )
+            }
+        removed = set(locations_old) - set(fp_locations)
+        if not changed and not removed:
+            return None
+        print(f"Incremental build: recomputing {len(changed)} out of {len(fp_locations)} locations…")
+        # Compute changed locations
+        dfs = []
+        df_new = None
+        if changed:
+            df_new = build_dataset({name: df[df.location.isin(changed)] for name, df in sources.items()})
+            dfs.append(df_new)
+        # Load unchanged locations
+        dfs += [
+            read_table(self._partition_path(locations_old[location]["file"]), memory_map=False)
+            for location in sorted(set(fp_locations) - changed)
+            if locations_old[location]["file"] is not None
+        ]
+        df = pd.concat(dfs, ignore_index=True).sort_values(["location", "date"])
+        self._pending = {
+            "fp_global": fp_global,
+            "fp_locations": fp_locations,
+            "changed": changed,
+            "removed": removed,
+            "df_new": df_new,
+            "locations_old": locations_old,
+        }
+        return df
+
+    def commit(self):
+        """Persist the last build."""
+        if self._pending is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        pending = self._pending
+        locations = {
+            location: pending["locations_old"][location]
+            for location in pending["fp_locations"]
+            if location not in pending["changed"]
+        }
+        # Partitions of changed locations
+        partitions = {}
+        if pending["df_new"] is not None:
+            partitions = dict(tuple(pending["df_new"].groupby("location")))
+        for location in pending["changed"]:
+            old = pending["locations_old"].get(location)
+            if old is not None and old["file"] is not None:
+                _remove(self._partition_path(old["file"]))
+            if location in partitions:
+                filename = f"{hashlib.sha1(location.encode()).hexdigest()[:16]}.feather"
+                write_table(partitions[location], self._partition_path(filename))
+            else:
+                filename = None
+            locations[location] = {"fingerprint": pending["fp_locations"][location], "file": filename}
+        # Partitions of removed locations
+        for location in pending["removed"]:
+            if pending["locations_old"][location]["file"] is not None:
+                _remove(self._partition_path(pending["locations_old"][location]["file"]))
+        state = {"version": STATE_VERSION, "global": pending["fp_global"], "locations": locations}
+        with open(self._state_path, "w") as f:
+            json.dump(state, f)
+        self._pending = None
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
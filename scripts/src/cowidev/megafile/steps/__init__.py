@@ -1,11 +1,15 @@
-from cowidev.megafile.steps.core import get_base_dataset
-from cowidev.megafile.steps.macro import add_macro_variables
-from cowidev.megafile.steps.xm import add_excess_mortality
+from cowidev.megafile.steps.core import get_base_dataset, load_sources, merge_sources
+from cowidev.megafile.steps.attributes import load_attributes, add_attributes
+from cowidev.megafile.steps.xm import load_excess_mortality, add_excess_mortality
 from cowidev.megafile.steps.vax import add_rolling_vaccinations
 
 __all__ = [
     "get_base_dataset",
-    "add_macro_variables",
+    "load_sources",
+    "merge_sources",
+    "load_attributes",
+    "add_attributes",
+    "load_excess_mortality",
     "add_excess_mortality",
     "add_rolling_vaccinations",
 ]
@@ -0,0 +1,118 @@
+"""Static attributes of each location: ISO code, continent and 'macro' variables (population, GDP per capita, etc.).
+
+Attributes are joined once into a table with one row per location, which is attached to the (daily) megafile in a
+single operation. The table is cached on disk, and only rebuilt when any of its input files changes (by modification
+time and size).
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from cowidev.utils.io import read_table, write_table
+
+
+CACHE_VERSION = 1
+"""Bump to invalidate cached tables (e.g. when the way they are built changes)."""
+
+
+def build_attributes(iso_file: str, continents_file: str, macro_variables: dict, data_dir: str) -> pd.DataFrame:
+    """Build the attributes table.
+
+    Args:
+        iso_file (str): ISO codes file (columns `iso_code`, `location`).
+        continents_file (str): OWID continents file.
+        macro_variables (dict): Path to the file of each macro variable (relative to `data_dir`), by variable name.
+        data_dir (str): Folder with the macro variable files.
+
+    Returns:
+        pd.DataFrame: One row per location, with columns `location`, `iso_code`, `continent` and the macro variables.
+                        Integer variables are stored as nullable integers (`Int64`).
+    """
+    attributes = pd.read_csv(iso_file)
+    continents = pd.read_csv(
+        continents_file,
+        names=["_1", "iso_code", "_2", "continent"],
+        usecols=["iso_code", "continent"],
+        header=0,
+    )
+    attributes = attributes.merge(continents, on="iso_code", how="left")
+    for var, file in macro_variables.items():
+        var_df = pd.read_csv(os.path.join(data_dir, file), usecols=["iso_code", var])
+        var_df = var_df[-var_df["iso_code"].isnull()]
+        var_df[var] = var_df[var].round(3)
+        if pd.api.types.is_integer_dtype(var_df[var]):
+            # Keep integers if all locations of the megafile have a value (as a merge would do)
+            var_df[var] = var_df[var].astype("Int64")
+        attributes = attributes.merge(var_df, on="iso_code", how="left")
+    if not attributes["location"].is_unique:
+        raise ValueError("Attributes must have exactly one row per location. Check for duplicated ISO codes.")
+    return attributes[["location", "iso_code", "continent", *macro_variables]]
+
+
+def load_attributes(
+    iso_file: str, continents_file: str, macro_variables: dict, data_dir: str, cache_dir: str
+) -> pd.DataFrame:
+    """Get the attributes table (see `build_attributes`), from the cache if none of its inputs changed.
+
+    Args:
+        cache_dir (str): Folder where the table is cached.
+        Other arguments: See `build_attributes`.
+
+    Returns:
+        pd.DataFrame: Attributes.
+    """
+    files = [iso_file, continents_file] + [os.path.join(data_dir, file) for file in macro_variables.values()]
+    sha = hashlib.sha1(json.dumps([CACHE_VERSION, macro_variables]).encode())
+    for path in files:
+        stat = os.stat(path)
+        sha.update(f"{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+    key = sha.hexdigest()
+    table_path = os.path.join(cache_dir, "attributes.feather")
+    key_path = os.path.join(cache_dir, "attributes.key")
+    try:
+        with open(key_path) as f:
+            if f.read() == key:
+                return read_table(table_path, memory_map=False)
+    except FileNotFoundError:
+        pass
+    attributes = build_attributes(iso_file, continents_file, macro_variables, data_dir)
+    write_table(attributes, table_path)
+    with open(key_path, "w") as f:
+        f.write(key)
+    return attributes
+
+
+def add_attributes(df: pd.DataFrame, attributes: pd.DataFrame) -> pd.DataFrame:
+    """Attach the attributes of each location to `df`.
+
+    Same output as merging the ISO codes (inner), continents and macro variables (left) onto `df` one after the other,
+    but `df` is only copied once.
+
+    Args:
+        df (pd.DataFrame): Data, with column `location`.
+        attributes (pd.DataFrame): Attributes (see `build_attributes`).
+
+    Returns:
+        pd.DataFrame: Data, with columns `iso_code`, `continent`, those of `df` and the macro variables.
+    """
+    indexer = pd.Index(attributes["location"]).get_indexer(df["location"])
+    if (indexer == -1).any():
+        print(set(df.loc[indexer == -1, "location"]))
+        raise Exception("Missing ISO code for some locations")
+
+    def _take(col):
+        values = attributes[col].take(indexer)
+        if isinstance(values.dtype, pd.Int64Dtype):
+            values = values.astype("int64" if values.notnull().all() else "float64")
+        return values.to_numpy()
+
+    macro_columns = [col for col in attributes.columns if col not in ("location", "iso_code", "continent")]
+    columns = {
+        "iso_code": _take("iso_code"),
+        "continent": _take("continent"),
+        **{col: df[col].values for col in df.columns},
+        **{col: _take(col) for col in macro_columns},
+    }
+    return pd.DataFrame(columns)
@@ -1,6 +1,11 @@
 import os
 
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+
 from cowidev import PATHS
+from cowidev.megafile.dag import run_steps
 from cowidev.megafile.steps.cgrt import get_cgrt
 from cowidev.megafile.steps.hosp import get_hosp
 from cowidev.megafile.steps.jhu import get_jhu
@@ -13,48 +18,147 @@ from cowidev.megafile.steps.vax import get_vax
 INPUT_DIR = PATHS.INTERNAL_INPUT_DIR
 GRAPHER_DIR = PATHS.INTERNAL_GRAPHER_DIR
 DATA_DIR = PATHS.DATA_DIR
+KEYS = ["location", "date"]
+# Sources merged with an outer join (the megafile has a row for each location-date in any of them), and sources only
+# joined on these rows
+SOURCES_OUTER = ["jhu", "reprod", "hosp", "testing", "vax"]
+SOURCES_LEFT = ["cgrt", "variants"]
 
 
 def get_base_dataset():
     """Get owid datasets from: jhu, reproduction rate, hospitalizations, testing ,vaccinations, CGRT."""
+    return merge_sources(load_sources())
+
+
+def load_sources(max_workers: int = None):
+    """Load owid datasets from: jhu, reproduction rate, hospitalizations, testing ,vaccinations, CGRT, variants.
+
+    Datasets are loaded concurrently (see `cowidev.megafile.dag`).
+
+    Args:
+        max_workers (int, optional): Maximum number of datasets loaded at once. Defaults to None (all at once).
+
+    Returns:
+        dict: Datasets, by source name. All have columns `location` and `date`.
+    """
+    steps = {
+        "jhu": (_load_jhu, []),
+        "reprod": (_load_reprod, []),
+        "hosp": (_load_hosp, []),
+        "testing": (_load_testing, []),
+        "vax": (_load_vax, []),
+        "cgrt": (_load_cgrt, []),
+        "variants": (_load_variants, []),
+    }
+    return run_steps(steps, max_workers=max_workers)
+
+
+def _load_jhu():
     print("Fetching JHU dataset…")
-    jhu = get_jhu(jhu_dir=PATHS.DATA_JHU_DIR)
+    return get_jhu(jhu_dir=PATHS.DATA_JHU_DIR, table_path=PATHS.INTERNAL_TMP_JHU_FILE)
+
 
+def _load_reprod():
     print("Fetching reproduction rate…")
-    reprod = get_reprod(
+    return get_reprod(
         file_url="https://github.com/crondonm/TrackingR/raw/main/Estimates-Database/database_7.csv",
         country_mapping=os.path.join(INPUT_DIR, "reproduction", "reprod_country_standardized.csv"),
     )
 
+
+def _load_hosp():
     print("Fetching hospital dataset…")
-    hosp = get_hosp(data_file=os.path.join(GRAPHER_DIR, "COVID-2019 - Hospital & ICU.csv"))
+    return get_hosp(data_file=os.path.join(GRAPHER_DIR, "COVID-2019 - Hospital & ICU.csv"))
+
 
+def _load_testing():
     print("Fetching testing dataset…")
-    testing = get_testing()
+    return get_testing()
+
 
+def _load_vax():
     print("Fetching vaccination dataset…")
     vax = get_vax(data_file=os.path.join(DATA_DIR, "vaccinations", "vaccinations.csv"))
-    vax = vax[-vax.location.isin(["England", "Northern Ireland", "Scotland", "Wales"])]
+    return vax[-vax.location.isin(["England", "Northern Ireland", "Scotland", "Wales"])]
 
+
+def _load_cgrt():
     print("Fetching OxCGRT dataset…")
-    cgrt = get_cgrt(
+    return get_cgrt(
         bsg_latest=os.path.join(INPUT_DIR, "bsg", "latest.csv"),
         country_mapping=os.path.join(INPUT_DIR, "bsg", "bsg_country_standardised.csv"),
     )
 
+
+def _load_variants():
     print("Fetching variants dataset…")
-    variants = get_variants(
+    return get_variants(
         variants_file="s3://covid-19/internal/variants/covid-variants.csv",
         cases_file=os.path.join(DATA_DIR, "jhu", "full_data.csv"),
     )
 
-    # Big merge
-    return (
-        jhu.merge(reprod, on=["date", "location"], how="outer")
-        .merge(hosp, on=["date", "location"], how="outer")
-        .merge(testing, on=["date", "location"], how="outer")
-        .merge(vax, on=["date", "location"], how="outer")
-        .merge(cgrt, on=["date", "location"], how="left")
-        .merge(variants, on=["date", "location"], how="left")
-        .sort_values(["location", "date"])
-    )
+
+def merge_sources(sources: dict) -> pd.DataFrame:
+    """Merge datasets loaded with `load_sources`.
+
+    Same as chaining outer merges of `SOURCES_OUTER` and left merges of `SOURCES_LEFT` on location and date, and
+    sorting by location and date. Instead, location and date are encoded as integers (consistently over all sources),
+    rows are aligned on the sorted union of keys, and the frame is assembled column by column.
+
+    Returns:
+        pd.DataFrame: Merged data, sorted by location and date.
+    """
+    sources = [(name, sources[name]) for name in SOURCES_OUTER + SOURCES_LEFT]
+    columns = [col for _, df in sources for col in df.columns if col not in KEYS]
+    if len(columns) != len(set(columns)) or any(df.duplicated(subset=KEYS).any() for _, df in sources):
+        # Overlapping columns or duplicate keys: the merge semantics (suffixes, row products) can't be aligned
+        return _merge_sources_chained(dict(sources))
+    # Encode keys as integers, one source at a time (so that only one source's keys are in memory besides the merged
+    # ones). Codes are sorted as the original values, so that the sorted integer keys follow the location and date
+    # order
+    locations = pd.Index(np.unique(np.concatenate([df.location.unique() for _, df in sources])))
+    dates = pd.Index(np.unique(np.concatenate([df.date.unique() for _, df in sources])))
+
+    def _encode(df):
+        return locations.get_indexer(df.location) * len(dates) + dates.get_indexer(df.date)
+
+    # Rows: union of keys of sources with outer join
+    keys_all = np.unique(np.concatenate([_encode(df) for _, df in sources[: len(SOURCES_OUTER)]]))
+    if len(keys_all) == 0:
+        return _merge_sources_chained(dict(sources))
+    data = {
+        "location": locations.to_numpy()[keys_all // len(dates)],
+        "date": dates.to_numpy()[keys_all % len(dates)],
+    }
+    for _, df in sources:
+        keys_source = _encode(df)
+        # Position of each row of the merged frame in the source (-1 if missing)
+        positions = np.searchsorted(keys_all, keys_source).clip(max=len(keys_all) - 1)
+        found = keys_all[positions] == keys_source
+        indexer = np.full(len(keys_all), -1, dtype=np.int64)
+        indexer[positions[found]] = np.flatnonzero(found)
+        # Free before taking the columns of the source
+        del keys_source, positions, found
+        for col in df.columns:
+            if col not in KEYS:
+                data[col] = _take(df[col], indexer)
+    # Column order as in the chained merges (keys at their position in the first source)
+    columns = [*sources[0][1].columns, *[col for col in columns if col not in sources[0][1].columns]]
+    return pd.DataFrame(data)[columns]
+
+
+def _take(values: pd.Series, indexer: np.ndarray):
+    """Get `values` at positions `indexer`, null for -1 (dtype upcast only if needed, as in `pd.merge`)."""
+    if isinstance(values.dtype, np.dtype):
+        return take(values.to_numpy(), indexer, allow_fill=True, fill_value=np.nan)
+    return values.array.take(indexer, allow_fill=True)
+
+
+def _merge_sources_chained(sources: dict) -> pd.DataFrame:
+    """Merge datasets loaded with `load_sources` with chained merges (see `merge_sources`)."""
+    df = sources[SOURCES_OUTER[0]]
+    for name in SOURCES_OUTER[1:]:
+        df = df.merge(sources[name], on=["date", "location"], how="outer")
+    for name in SOURCES_LEFT:
+        df = df.merge(sources[name], on=["date", "location"], how="left")
+    return df.sort_values(["location", "date"])
@@ -1,38 +1,51 @@
-"merge"
 import os
 from functools import reduce
 import pandas as pd
 
+from cowidev.utils.io import read_table
 
-def get_jhu(jhu_dir: str):
+
+JHU_VARIABLES = [
+    "total_cases",
+    "new_cases",
+    "weekly_cases",
+    "total_deaths",
+    "new_deaths",
+    "weekly_deaths",
+    "total_cases_per_million",
+    "new_cases_per_million",
+    "weekly_cases_per_million",
+    "total_deaths_per_million",
+    "new_deaths_per_million",
+    "weekly_deaths_per_million",
+]
+JHU_VARIABLES_RENAME = {
+    "weekly_cases": "new_cases_smoothed",
+    "weekly_deaths": "new_deaths_smoothed",
+    "weekly_cases_per_million": "new_cases_smoothed_per_million",
+    "weekly_deaths_per_million": "new_deaths_smoothed_per_million",
+}
+
+
+def get_jhu(jhu_dir: str, table_path: str = None):
     """
     Reads each COVID-19 JHU dataset located in /public/data/jhu/
     Melts the dataframe to vertical format (1 row per country and date)
     Merges all JHU dataframes into one with outer joins
 
+    If `table_path` is given and is up to date with the files in `jhu_dir`, the data is read from there instead (long
+    format, written by `cowidev.jhu`).
+
     Returns:
         jhu {dataframe}
     """
-
-    jhu_variables = [
-        "total_cases",
-        "new_cases",
-        "weekly_cases",
-        "total_deaths",
-        "new_deaths",
-        "weekly_deaths",
-        "total_cases_per_million",
-        "new_cases_per_million",
-        "weekly_cases_per_million",
-        "total_deaths_per_million",
-        "new_deaths_per_million",
-        "weekly_deaths_per_million",
-    ]
+    if table_path is not None and _is_up_to_date(table_path, jhu_dir):
+        return _get_jhu_from_table(table_path)
 
     data_frames = []
 
     # Process each file and melt it to vertical format
-    for jhu_var in jhu_variables:
+    for jhu_var in JHU_VARIABLES:
         tmp = pd.read_csv(os.path.join(jhu_dir, f"{jhu_var}.csv"))
         country_cols = list(tmp.columns)
         country_cols.remove("date")
@@ -50,15 +63,7 @@ def get_jhu(jhu_dir: str):
 
         if jhu_var[:7] == "weekly_":
             tmp[jhu_var] = tmp[jhu_var].div(7).round(3)
-            tmp = tmp.rename(
-                errors="ignore",
-                columns={
-                    "weekly_cases": "new_cases_smoothed",
-                    "weekly_deaths": "new_deaths_smoothed",
-                    "weekly_cases_per_million": "new_cases_smoothed_per_million",
-                    "weekly_deaths_per_million": "new_deaths_smoothed_per_million",
-                },
-            )
+            tmp = tmp.rename(errors="ignore", columns=JHU_VARIABLES_RENAME)
         else:
             tmp[jhu_var] = tmp[jhu_var].round(3)
         data_frames.append(tmp)
@@ -70,3 +75,37 @@ def get_jhu(jhu_dir: str):
     )
 
     return jhu
+
+
+def _is_up_to_date(table_path: str, jhu_dir: str) -> bool:
+    try:
+        return os.path.getmtime(table_path) >= os.path.getmtime(os.path.join(jhu_dir, "total_cases.csv"))
+    except OSError:
+        return False
+
+
+def _get_jhu_from_table(table_path: str):
+    """Same as `get_jhu`, reading the long-format table instead of one wide file per variable."""
+    jhu = read_table(table_path, columns=["location", "date", *JHU_VARIABLES])
+    jhu[JHU_VARIABLES] = jhu[JHU_VARIABLES].astype(float)
+
+    # Carrying last observation forward for International totals to avoid discrepancies (over all dates, as in the
+    # wide files)
+    if (jhu.location == "International").any():
+        totals = [v for v in JHU_VARIABLES if v[:5] == "total"]
+        dates = pd.DataFrame({"date": sorted(jhu.date.unique())})
+        international = dates.merge(jhu[jhu.location == "International"], on="date", how="left").assign(
+            location="International"
+        )
+        international[totals] = international[totals].ffill()
+        jhu = pd.concat([jhu[jhu.location != "International"], international], ignore_index=True)
+
+    for jhu_var in JHU_VARIABLES:
+        if jhu_var[:7] == "weekly_":
+            jhu[jhu_var] = jhu[jhu_var].div(7).round(3)
+        else:
+            jhu[jhu_var] = jhu[jhu_var].round(3)
+
+    jhu = jhu.dropna(subset=JHU_VARIABLES, how="all").rename(columns=JHU_VARIABLES_RENAME)
+    columns = ["date", "location", *[JHU_VARIABLES_RENAME.get(v, v) for v in JHU_VARIABLES]]
+    return jhu[columns].reset_index(drop=True)
@@ -42,19 +42,63 @@ def get_vax(data_file):
     return vax
 
 
-def _add_rolling(df: pd.DataFrame) -> pd.DataFrame:
-    last_known_date = df.loc[df.total_vaccinations.notnull(), "date"].max()
+def add_rolling_vaccinations(df: pd.DataFrame) -> pd.DataFrame:
+    """Add the number of vaccinations administered in the last 6, 9 and 12 months, by location.
+
+    Total vaccinations are linearly interpolated within each location, and differenced into daily vaccinations, which
+    are then summed over rolling windows. Values after the last date with data of a location are left empty.
+
+    All locations are computed at once, on rows sorted by location (keeping their order within each location). The
+    output is the same as computing each location separately.
+    """
+    codes, _ = pd.factorize(df["location"], sort=True)
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+    is_first = np.r_[True, codes[1:] != codes[:-1]]
+    # Daily vaccinations
+    total_vaccinations = df["total_vaccinations"].to_numpy(dtype=float)[order]
+    total_vaccinations = _interpolate_by_group(total_vaccinations, is_first)
+    daily_vaccinations = np.r_[np.nan, np.diff(total_vaccinations)]
+    daily_vaccinations[is_first] = np.nan
+    daily_vaccinations = pd.Series(daily_vaccinations)
+    # Dates after the last date with data
+    last_known_date = df.loc[df["total_vaccinations"].notnull()].groupby("location")["date"].max()
+    last_known_date = df["location"].map(last_known_date)
+    msk = (df["date"] > last_known_date).to_numpy()
+    population = df["population"].to_numpy(dtype=float)
+    columns = {}
     for n_months in (6, 9, 12):
         n_days = round(365.2425 * n_months / 12)
-        df[f"rolling_vaccinations_{n_months}m"] = (
-            df.total_vaccinations.interpolate(method="linear").diff().rolling(n_days, min_periods=1).sum().round()
+        rolling = np.empty(len(df))
+        rolling[order] = (
+            daily_vaccinations.groupby(codes, sort=False).rolling(n_days, min_periods=1).sum().round().to_numpy()
         )
-        df.loc[df.date > last_known_date, f"rolling_vaccinations_{n_months}m"] = np.NaN
-        df[f"rolling_vaccinations_{n_months}m_per_hundred"] = (
-            df[f"rolling_vaccinations_{n_months}m"] * 100 / df.population
-        ).round(2)
-    return df
+        rolling[msk] = np.nan
+        columns[f"rolling_vaccinations_{n_months}m"] = rolling
+        with np.errstate(divide="ignore", invalid="ignore"):
+            columns[f"rolling_vaccinations_{n_months}m_per_hundred"] = np.round(rolling * 100 / population, 2)
+    return df.assign(**columns).reset_index(drop=True)
 
 
-def add_rolling_vaccinations(df: pd.DataFrame) -> pd.DataFrame:
-    return df.groupby("location").apply(_add_rolling).reset_index(drop=True)
+def _interpolate_by_group(values: np.ndarray, is_first: np.ndarray) -> np.ndarray:
+    """Linearly interpolate `values` within each group, as `pd.Series.interpolate(method="linear")` does.
+
+    Rows must be sorted by group, with `is_first` flagging the first row of each group. Null values before the first
+    value of a group are kept, and those after its last value are filled with it.
+    """
+    valid = ~np.isnan(values)
+    if valid.all() or not valid.any():
+        return values
+    positions = np.arange(len(values))
+    result = values.copy()
+    result[~valid] = np.interp(positions[~valid], positions[valid], values[valid])
+    # Closest value before and after each row (position), within its group
+    group_start = np.maximum.accumulate(np.where(is_first, positions, 0))
+    group_end = np.r_[group_start[1:] != group_start[:-1], True]
+    group_end = np.minimum.accumulate(np.where(group_end, positions, len(values))[::-1])[::-1]
+    previous = np.maximum.accumulate(np.where(valid, positions, -1))
+    following = np.minimum.accumulate(np.where(valid, positions, len(values))[::-1])[::-1]
+    after_last = following > group_end
+    result[after_last] = values[previous[after_last]]
+    result[previous < group_start] = np.nan
+    return result
@@ -1,8 +1,13 @@
 import pandas as pd
 
 
-def add_excess_mortality(df: pd.DataFrame, wmd_hmd_file: str, economist_file: str) -> pd.DataFrame:
+def load_excess_mortality(wmd_hmd_file: str, economist_file: str) -> tuple:
+    """Load excess mortality data from HMD & WMD, and from The Economist.
 
+    Returns:
+        tuple: HMD & WMD data and The Economist data (pd.DataFrame), with columns `location`, `date` and those added to
+                the megafile.
+    """
     # XM data from HMD & WMD
     column_mapping = {
         "p_proj_all_ages": "excess_mortality",  # excess_mortality_perc_weekly
@@ -13,7 +18,7 @@ def add_excess_mortality(df: pd.DataFrame, wmd_hmd_file: str, economist_file: st
         "excess_per_million_proj_all_ages": "excess_mortality_count_week_pm",  # excess_mortality_count_week_pm
     }
     wmd_hmd = pd.read_csv(wmd_hmd_file, usecols=["location", "date"] + list(column_mapping.keys()))
-    df = df.merge(wmd_hmd, how="left", on=["location", "date"]).rename(columns=column_mapping)
+    wmd_hmd = wmd_hmd.rename(columns=column_mapping)
 
     # XM data from The Economist
     econ = pd.read_csv(
@@ -35,6 +40,12 @@ def add_excess_mortality(df: pd.DataFrame, wmd_hmd_file: str, economist_file: st
             "estimated_daily_excess_deaths_ci_95_bot_per_100k",
         ],
     ).rename(columns={"country": "location"})
-    df = df.merge(econ, how="left", on=["location", "date"])
+    return wmd_hmd, econ
+
 
+def add_excess_mortality(df: pd.DataFrame, excess_mortality: tuple) -> pd.DataFrame:
+    """Add excess mortality data loaded with `load_excess_mortality`."""
+    wmd_hmd, econ = excess_mortality
+    df = df.merge(wmd_hmd, how="left", on=["location", "date"])
+    df = df.merge(econ, how="left", on=["location", "date"])
     return df
@@ -1,12 +1,14 @@
 import pandas as pd
 
+from cowidev.utils.web.download import read_csv_from_url
+
 
 class OxCGRTETL:
     def __init__(self) -> None:
         self.source_url = "https://raw.githubusercontent.com/OxCGRT/covid-policy-tracker/master/data/OxCGRT_latest.csv"
 
     def extract(self):
-        return pd.read_csv(self.source_url, low_memory=False)
+        return read_csv_from_url(self.source_url, low_memory=False)
 
     def transform(self, df: pd.DataFrame) -> pd.DataFrame:
         return df
@@ -3,13 +3,13 @@ import os
 import tempfile
 
 import requests
-from pdfminer.high_level import extract_text 
 import pandas as pd
 
 
 from cowidev.utils import clean_date_series
 from cowidev.utils.clean.dates import localdatenow
 from cowidev.utils.gdrive import download_folder, download_file, list_files
+from cowidev.utils.pdf import read_pdf_text
 from cowidev.testing import CountryTestBase
 
 
@@ -51,8 +51,7 @@ class Philippines(CountryTestBase):
 
     def _parse_drive_id_from_pdf(self, pdf_path):
         # Get link from pdf
-        with open(pdf_path, "rb") as f:
-            text = extract_text(f)
+        text = read_pdf_text(pdf_path)
         link = re.search(r"https://bit\.ly/.*", text).group()
         # Unshorten
         resp = requests.get(link)
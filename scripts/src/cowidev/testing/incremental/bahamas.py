@@ -1,11 +1,10 @@
 import re
-import requests
 
 from bs4 import BeautifulSoup
 import pandas as pd
-import tabula
 
 from cowidev.utils import get_soup, clean_count, clean_date
+from cowidev.utils.pdf import read_pdf_tables
 from cowidev.testing import CountryTestBase
 
 
@@ -56,8 +55,7 @@ class Bahamas(CountryTestBase):
 
     def _parse_pdf_table(self) -> pd.DataFrame:
         """Parse pdf table from link"""
-        response = requests.get(self.source_url_ref, stream=True, verify=True)
-        tables = tabula.read_pdf(response.raw, pages="all")
+        tables = read_pdf_tables(self.source_url_ref, pages="all")
         table = [df for df in tables if self.column_to_check in df.columns]
         if not table:
             raise ValueError("Table not found, please update the script")
@@ -1,12 +1,10 @@
-import requests
-
 from bs4 import BeautifulSoup
 import pandas as pd
-import tabula
 
 from cowidev.utils import get_soup
 from cowidev.utils.log import get_logger
 from cowidev.utils.clean import extract_clean_date
+from cowidev.utils.pdf import read_pdf_tables
 from cowidev.testing.utils.orgs import EMRO_COUNTRIES
 from cowidev.testing.utils.base import CountryTestBase
 
@@ -76,8 +74,7 @@ class EMRO(CountryTestBase):
 
     def _parse_pdf_table(self) -> list:
         """Parses pdf table"""
-        response = requests.get(self.source_url_ref, stream=True, verify=True)
-        df_list = tabula.read_pdf(response.raw, pages="all", area=self.area)
+        df_list = read_pdf_tables(self.source_url_ref, pages="all", area=self.area)
         return df_list
 
     def _parse_date(self, df_list: list) -> str:
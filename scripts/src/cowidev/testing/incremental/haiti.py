@@ -1,13 +1,11 @@
 import re
-import tempfile
 
 from bs4 import BeautifulSoup
 import pandas as pd
-from pdfminer.high_level import extract_text
 
 from cowidev.utils import get_soup, clean_count
 from cowidev.utils.clean import extract_clean_date
-from cowidev.utils.utils import download_file_from_url
+from cowidev.utils.pdf import read_pdf_text
 from cowidev.testing.utils.base import CountryTestBase
 
 
@@ -43,10 +41,7 @@ class Haiti(CountryTestBase):
 
     def _extract_text_from_url(self) -> str:
         """Extracts text from pdf."""
-        with tempfile.NamedTemporaryFile() as tmp:
-            download_file_from_url(self.source_url_ref, tmp.name)
-            with open(tmp.name, "rb") as f:
-                text = extract_text(f).replace("\n", " ")
+        text = read_pdf_text(self.source_url_ref).replace("\n", " ")
         text = re.sub(r"\s+", " ", text)
         return text
 
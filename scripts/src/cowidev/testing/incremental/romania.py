@@ -1,13 +1,11 @@
 import re
-import tempfile
 
 from bs4 import BeautifulSoup, element
 import pandas as pd
-from pdfminer.high_level import extract_text
 
 from cowidev.utils.web import get_soup
-from cowidev.utils.web.download import download_file_from_url
 from cowidev.utils.clean import clean_count, clean_date
+from cowidev.utils.pdf import read_pdf_text
 from cowidev.testing.utils.incremental import increment
 
 
@@ -89,10 +87,7 @@ class Romania:
 
     def _parse_pdf_link(self, url: str) -> str:
         """Get text from the pdf link."""
-        with tempfile.NamedTemporaryFile() as tmp:
-            download_file_from_url(url, tmp.name)
-            with open(tmp.name, "rb") as f:
-                text = extract_text(f)
+        text = read_pdf_text(url)
         text = re.sub(r"(\d)\.(\d)", r"\1\2", text)
         return text
 
@@ -1,15 +1,13 @@
 import re
-import tempfile
 
 
 import pandas as pd
 from bs4 import BeautifulSoup
-from pdfminer.high_level import extract_text
 
 
 from cowidev.utils import clean_count, get_soup
 from cowidev.utils.clean import extract_clean_date
-from cowidev.utils.utils import download_file_from_url
+from cowidev.utils.pdf import read_pdf_text
 from cowidev.testing.utils.base import CountryTestBase
 
 
@@ -49,10 +47,7 @@ class Tanzania(CountryTestBase):
 
     def _extract_text_from_url(self) -> str:
         """Extracts text from pdf."""
-        with tempfile.NamedTemporaryFile() as tmp:
-            download_file_from_url(self.source_url_ref, tmp.name)
-            with open(tmp.name, "rb") as f:
-                text = extract_text(f).replace("\n", " ").replace(",", "")
+        text = read_pdf_text(self.source_url_ref).replace("\n", " ").replace(",", "")
         text = re.sub(r"\s+", " ", text)
         return text
 
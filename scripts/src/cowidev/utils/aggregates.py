@@ -0,0 +1,100 @@
+"""Regional aggregates (World, continents, income groups, etc.).
+
+Aggregates are defined by name, each with optional fields `include` (member locations, None for all) and `exclude`
+(locations left out):
+
+    {
+        "World": {"include": None, "exclude": None},
+        "World excl. China": {"exclude": ["China"]},
+        "European Union": {"include": ["Austria", "Belgium", ...]},
+    }
+
+Location membership is resolved once, and all aggregates are then computed with a single groupby.
+"""
+import pandas as pd
+
+
+def build_membership(locations, aggregates: dict) -> pd.DataFrame:
+    """Build the location → aggregate membership table.
+
+    Args:
+        locations (iterable): Locations.
+        aggregates (dict): Aggregate definitions, by name.
+
+    Returns:
+        pd.DataFrame: One row per membership, with columns `location` and `aggregate` (categorical, ordered as in
+                        `aggregates`). Sorted by location (in order of appearance) and aggregate.
+    """
+    locations = pd.Index(pd.unique(pd.Series(locations)), name="location")
+    matrix = pd.DataFrame(False, index=locations, columns=pd.Index(list(aggregates), name="aggregate"))
+    for name, spec in aggregates.items():
+        members = locations
+        if spec.get("include") is not None:
+            members = members[members.isin(spec["include"])]
+        if spec.get("exclude") is not None:
+            members = members[~members.isin(spec["exclude"])]
+        matrix.loc[members, name] = True
+    membership = matrix.stack()
+    membership = membership[membership].reset_index()[["location", "aggregate"]]
+    membership["aggregate"] = pd.Categorical(membership["aggregate"], categories=list(aggregates), ordered=True)
+    return membership
+
+
+def aggregate(
+    df: pd.DataFrame,
+    aggregates: dict,
+    columns: list = None,
+    ffill: list = None,
+    by: list = None,
+    membership: pd.DataFrame = None,
+) -> pd.DataFrame:
+    """Sum the values of member locations, for all `aggregates` at once.
+
+    An aggregate has a row for every date with data for any of its members (and, if `by` is given, for every value of
+    `by` of its members). Null values are skipped (all-null sums are 0).
+
+    Args:
+        df (pd.DataFrame): Data, with columns `location`, `date` and those in `by` and `columns`. At most one row per
+                            location, date (and `by`).
+        aggregates (dict): Aggregate definitions, by name (see module docstring).
+        columns (list, optional): Columns to sum. Defaults to None (all numeric columns).
+        ffill (list, optional): Columns forward-filled by location (and `by`) before summing, so that a member that
+                                did not report on a date contributes with its last reported value. Defaults to None.
+        by (list, optional): Additional keys, summed separately (e.g. vaccine). Defaults to None.
+        membership (pd.DataFrame, optional): Membership table (see `build_membership`). Defaults to None (built from
+                                                `df`).
+
+    Returns:
+        pd.DataFrame: Aggregates, with columns `location` (aggregate name), `date`, `by` and `columns`. Sorted by
+                        aggregate (in order of `aggregates`), date and `by`.
+    """
+    by = list(by or [])
+    keys = ["location", *by]
+    if columns is None:
+        columns = [col for col in df.select_dtypes(include=["number", "bool"]).columns if col not in keys]
+    if membership is None:
+        membership = build_membership(df["location"], aggregates)
+    data = df[[*keys, "date", *columns]]
+    if ffill:
+        # Complete (location, by) x date grid, so that values are also carried forward to dates with no row
+        grid = data[keys].drop_duplicates().merge(data[["date"]].drop_duplicates(), how="cross")
+        data = grid.merge(data, on=[*keys, "date"], how="left").sort_values([*keys, "date"])
+        data[ffill] = data.groupby(keys)[ffill].ffill()
+        # Dates with data for any member, by aggregate
+        dates = (
+            df[["location", "date"]]
+            .drop_duplicates()
+            .merge(membership, on="location")[["aggregate", "date"]]
+            .drop_duplicates()
+        )
+    agg = (
+        data.merge(membership, on="location")
+        .groupby(["aggregate", "date", *by], observed=True)[columns]
+        .sum()
+        .reset_index()
+    )
+    if ffill:
+        agg = agg.merge(dates, on=["aggregate", "date"])
+    agg = agg.rename(columns={"aggregate": "location"})
+    agg["location"] = agg["location"].astype(str)
+    return agg[["location", "date", *by, *columns]]
@@ -1,14 +1,218 @@
-import zipfile
+import io
+import json
+import os
 import tempfile
+import zipfile
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from pyarrow import feather
+import xlsxwriter
+from xlsxwriter.worksheet import Worksheet
 
-from cowidev.utils.web.download import download_file_from_url
+from cowidev.utils.web.download import open_url
 
 
 def extract_zip(input_path, output_folder):
     if input_path.startswith("http"):
-        with tempfile.NamedTemporaryFile() as tf:
-            download_file_from_url(input_path, tf.name)
-            z = zipfile.ZipFile(tf.name)
+        with open_url(input_path) as f:
+            if not f.seekable():
+                f = io.BytesIO(f.read())
+            zipfile.ZipFile(f).extractall(output_folder)
     else:
         z = zipfile.ZipFile(input_path)
-    z.extractall(output_folder)
+        z.extractall(output_folder)
+
+
+def write_table(df: pd.DataFrame, path: str):
+    """Write `df` to an internal columnar file (Arrow IPC/Feather).
+
+    Use it for data handed over between pipeline stages. Column types are preserved, and the file is written
+    uncompressed so that it can be memory-mapped when read. The index is not stored.
+
+    Args:
+        df (pd.DataFrame): Data.
+        path (str): Output path. The file is replaced atomically.
+    """
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=folder or None, suffix=".tmp", delete=False) as tmp:
+        pass
+    try:
+        feather.write_feather(df.reset_index(drop=True), tmp.name, compression="uncompressed")
+        os.replace(tmp.name, path)
+    except BaseException:
+        os.remove(tmp.name)
+        raise
+
+
+def read_table(path: str, columns: list = None, memory_map: bool = True) -> pd.DataFrame:
+    """Read an internal columnar file written with `write_table`.
+
+    Args:
+        path (str): Path to file.
+        columns (list, optional): Columns to read. Defaults to None (all columns).
+        memory_map (bool, optional): Memory-map the file instead of reading it. Defaults to True.
+
+    Returns:
+        pd.DataFrame: Data.
+    """
+    return feather.read_feather(path, columns=columns, memory_map=memory_map)
+
+
+XLSX_HEADER_FORMAT = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+"""Header cell format (same as `pd.DataFrame.to_excel`)."""
+
+
+def write_xlsx(df: pd.DataFrame, path: str, sheet_name: str = "Sheet1"):
+    """Write `df` to an XLSX file, with constant memory usage.
+
+    Rows are written to disk as they are added (xlsxwriter's `constant_memory` mode), and cell types are resolved
+    once per column instead of once per cell. Output is equivalent to `df.to_excel(path, index=False,
+    engine="xlsxwriter")`: null values are left empty, infinite values are written as text ("inf", "-inf"), and
+    strings are always written as text (never as formulas or URLs).
+
+    Args:
+        df (pd.DataFrame): Data.
+        path (str): Output path.
+        sheet_name (str, optional): Name of the sheet. Defaults to "Sheet1".
+    """
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    worksheet = workbook.add_worksheet(sheet_name)
+    header_format = workbook.add_format(XLSX_HEADER_FORMAT)
+    for col, name in enumerate(df.columns):
+        worksheet.write_string(0, col, str(name), header_format)
+    writers = []
+    columns = []
+    for col in df.columns:
+        writers.append(partial(_xlsx_writer(df[col]), worksheet))
+        values = df[col].to_numpy(dtype=object)
+        values[df[col].isna().to_numpy()] = None
+        columns.append(values)
+    for row, values in enumerate(zip(*columns), start=1):
+        for col, (write, value) in enumerate(zip(writers, values)):
+            if value is not None:
+                write(row, col, value)
+    workbook.close()
+
+
+def _xlsx_writer(values: pd.Series):
+    """Get the function writing the (non-null) cells of column `values`. Its first argument is the worksheet."""
+    dtype = values.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return Worksheet.write_boolean
+    if pd.api.types.is_float_dtype(dtype):
+        return _xlsx_write_float
+    if pd.api.types.is_numeric_dtype(dtype):
+        return Worksheet.write_number
+    if pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty"):
+        return Worksheet.write_string
+    # Mixed types, resolved per cell
+    return _xlsx_write_any
+
+
+def _xlsx_write_float(worksheet, row, col, value):
+    # xlsxwriter can't write infinite numbers (same as `to_excel`'s `inf_rep`)
+    if np.isinf(value):
+        return worksheet.write_string(row, col, "inf" if value > 0 else "-inf")
+    return worksheet.write_number(row, col, value)
+
+
+def _xlsx_write_any(worksheet, row, col, value):
+    if isinstance(value, str):
+        return worksheet.write_string(row, col, value)
+    if isinstance(value, float):
+        return _xlsx_write_float(worksheet, row, col, value)
+    return worksheet.write(row, col, value)
+
+
+def json_objects(df: pd.DataFrame, indent: int = None, level: int = 0, allow_nan: bool = True) -> list:
+    """Encode the rows of `df` as JSON objects, skipping null values.
+
+    Values are encoded one column at a time. Each row is encoded exactly as `json.dumps` encodes
+    `{k: v for k, v in row.items() if pd.notnull(v)}`. When `indent` is None the output is compact (separators ','
+    and ':'). Otherwise it is indented as if the object were nested `level` levels deep.
+
+    Args:
+        df (pd.DataFrame): Data. Columns are used as keys.
+        indent (int, optional): Indentation. Defaults to None (compact).
+        level (int, optional): Nesting level of the objects (only used if `indent` is given). Defaults to 0.
+        allow_nan (bool, optional): Encode infinite values as `Infinity` (invalid JSON) instead of raising an error.
+                                    Defaults to True.
+
+    Returns:
+        list: One JSON object (str) per row.
+    """
+    if indent is None:
+        key_sep, item_sep, start, end = ":", ",", "{", "}"
+    else:
+        pad = " " * indent
+        key_sep = ": "
+        item_sep = ",\n" + pad * (level + 1)
+        start, end = "{\n" + pad * (level + 1), "\n" + pad * level + "}"
+    columns = [_json_values(df[col], allow_nan, prefix=json.dumps(str(col)) + key_sep) for col in df.columns]
+    objects = []
+    for items in zip(*columns):
+        items = [item for item in items if item is not None]
+        objects.append(start + item_sep.join(items) + end if items else "{}")
+    if not columns:
+        objects = ["{}"] * len(df)
+    return objects
+
+
+def write_columnar_json(df: pd.DataFrame, path: str):
+    """Write `df` as columnar JSON: column names are keys, and values are lists with the column values.
+
+    Null values are written as null. Values are encoded one column at a time, with the same output as
+    `json.dumps(d, separators=(",", ":"), allow_nan=False)` with `d` being `df.to_dict(orient="list")` (with NaNs
+    replaced by None).
+
+    Example:
+        {
+            "location": ["Afghanistan", "Afghanistan", ... ],
+            "date": ["2020-03-01", "2020-03-02", ... ]
+        }
+
+    Args:
+        df (pd.DataFrame): Data.
+        path (str): Output path.
+    """
+    with open(path, "w") as f:
+        f.write("{")
+        for i, col in enumerate(df.columns):
+            values = _json_values(df[col], allow_nan=False)
+            f.write(f"{',' if i else ''}{json.dumps(str(col))}:[")
+            f.write(",".join("null" if v is None else v for v in values))
+            f.write("]")
+        f.write("}")
+
+
+def _json_values(values: pd.Series, allow_nan: bool, prefix: str = "") -> list:
+    """Encode `values` as JSON (preceded by `prefix`), None for null values."""
+    mask = values.isna().to_numpy()
+    dtype = values.dtype
+    values = values.to_numpy(dtype=object)
+    if pd.api.types.is_float_dtype(dtype):
+        encode = partial(_json_float, allow_nan=allow_nan)
+    elif pd.api.types.is_bool_dtype(dtype):
+        encode = _json_bool
+    elif pd.api.types.is_integer_dtype(dtype):
+        encode = int.__repr__
+    else:
+        encode = partial(json.dumps, allow_nan=allow_nan)
+    return [None if m else prefix + encode(v) for v, m in zip(values, mask)]
+
+
+def _json_bool(value: bool) -> str:
+    return "true" if value else "false"
+
+
+def _json_float(value: float, allow_nan: bool) -> str:
+    # Same as json's float encoding
+    if np.isinf(value):
+        if not allow_nan:
+            raise ValueError(f"Out of range float values are not JSON compliant: {value!r}")
+        return "Infinity" if value > 0 else "-Infinity"
+    return float.__repr__(value)
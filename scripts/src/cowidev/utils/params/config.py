@@ -85,10 +85,50 @@ class PipelineConfig:
         self.vaccinations = VaccinationsConfig(**self.vaccinations)
 
 
+EXECUTION_BACKENDS = ["threads", "processes", "hybrid"]
+
+
 @dataclass()
 class ExecutionConfig:
     parallel: bool
     njobs: int
+    backend: str = "threads"
+    process_modules: list = None
+    njobs_driver: int = None
+    max_requests_per_host: int = None
+    max_retries: int = 1
+
+    def __post_init__(self):
+        if self.backend is None:
+            self.backend = "threads"
+        if self.backend not in EXECUTION_BACKENDS:
+            raise ConfigFileError(
+                f"Invalid execution backend: {self.backend}. Valid backends are {EXECUTION_BACKENDS}. Check file"
+                f" {CONFIG_FILE}."
+            )
+        if self.process_modules is None:
+            self.process_modules = []
+        if self.max_retries is None:
+            self.max_retries = 1
+        # Modules are always identified by their full dotted name (as imported), e.g. cowidev.hosp.sources.austria
+        invalid = [m for m in self.process_modules if not str(m).startswith("cowidev.")]
+        if invalid:
+            raise ConfigFileError(
+                f"Invalid process modules: {invalid}. Use full module names (e.g. cowidev.vax.batch.ecdc). Check file"
+                f" {CONFIG_FILE}."
+            )
+
+    def backend_for(self, module_name: str) -> str:
+        """Get the backend to run module `module_name` with ('threads' or 'processes').
+
+        With backend 'hybrid', only modules listed in `process_modules` run in a separate process.
+
+        Args:
+            module_name (str): Full dotted module name, e.g. cowidev.vax.batch.ecdc.
+        """
+        if self.backend == "hybrid":
+            return "processes" if module_name in self.process_modules else "threads"
+        return self.backend
 
 
 @dataclass()
@@ -107,7 +147,6 @@ try:
 except TypeError as e:
     err_msg = (
         f"The format of the configuration file is not correct! Please check file {CONFIG_FILE} that it contains all"
-        " required fields. Original raised error was: "
-        + str(e)
+        " required fields. Original raised error was: " + str(e)
     )
     raise ConfigFileError(err_msg)
@@ -138,8 +138,9 @@ INTERNAL_INPUT_TEMPLATE_STATUS = os.path.join(INTERNAL_INPUT_TEMPLATE, "status.m
 INTERNAL_GRAPHER_DIR = os.path.join(INTERNAL_DIR, "grapher")
 
 ## Temporary
-INTERNAL_TMP_VAX_MAIN_FILE = os.path.join(INTERNAL_DIR, "vaccinations.preliminary.csv")
+INTERNAL_TMP_VAX_MAIN_FILE = os.path.join(INTERNAL_DIR, "vaccinations.preliminary.feather")
 INTERNAL_TMP_VAX_META_FILE = os.path.join(INTERNAL_DIR, "metadata.preliminary.csv")
+INTERNAL_TMP_JHU_FILE = os.path.join(INTERNAL_TMP_DIR, "jhu.feather")
 
 ## Status
 INTERNAL_STATUS_FILE = os.path.join(INTERNAL_OUTPUT_DIR, "STATUS.md")
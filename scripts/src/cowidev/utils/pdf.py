@@ -0,0 +1,177 @@
+"""PDF extraction (tables with tabula, text with pdfminer).
+
+Extracted tables and text are cached on disk by PDF content (SHA-256) and extraction arguments, so a bulletin that has
+not changed since the last run is not parsed again. PDFs given by URL are downloaded through the HTTP client (see
+`cowidev.utils.web.cache`), so unchanged files are not downloaded again either.
+
+tabula runs in-process via JPype when it is installed: the JVM is started once, and stays warm for all later calls.
+Otherwise, tabula falls back to launching a JVM per call.
+
+The cache is configured via environment variables:
+
+    - OWID_COVID_PDF_CACHE: 'on' (default) or 'off'.
+    - OWID_COVID_PDF_CACHE_DIR: Cache folder. Defaults to ~/.cache/owid/pdf.
+    - OWID_COVID_PDF_CACHE_TTL: Entries not used for this many seconds are evicted. Defaults to 30 days.
+"""
+import hashlib
+import io
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+import tabula
+from pdfminer.high_level import extract_text
+
+from cowidev.utils.web.scraping import get_response
+
+
+CACHE_DIR_DEFAULT = os.path.join(os.path.expanduser("~"), ".cache", "owid", "pdf")
+CACHE_TTL_DEFAULT = 30 * 24 * 3600
+
+# tabula's JVM is shared by all threads of the process
+_tabula_lock = threading.Lock()
+
+
+class PDFCache:
+    """On-disk cache of PDF extractions, keyed by PDF content and extraction arguments.
+
+    Args:
+        cache_dir (str): Folder where extractions are stored.
+        enabled (bool, optional): Set to False to disable the cache. Defaults to True.
+        ttl (int, optional): Entries not used in the last `ttl` seconds are evicted. Defaults to CACHE_TTL_DEFAULT.
+    """
+
+    def __init__(self, cache_dir: str, enabled: bool = True, ttl: int = CACHE_TTL_DEFAULT):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.ttl = ttl
+
+    def key(self, content: bytes, kind: str, kwargs: dict) -> str:
+        """Build cache key from PDF `content`, extraction `kind` ('tables' or 'text') and arguments."""
+        sha = hashlib.sha256(content)
+        sha.update(json.dumps([kind, kwargs], sort_keys=True, default=repr).encode())
+        return sha.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pkl")
+
+    def get(self, key):
+        """Get cached extraction. None if not cached."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        os.utime(path)
+        return value
+
+    def set(self, key, value):
+        """Store extraction."""
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as tmp:
+            pickle.dump(value, tmp)
+        os.replace(tmp.name, path)
+
+    def evict(self):
+        """Remove entries not used in the last `ttl` seconds."""
+        now = time.time()
+        for root, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                try:
+                    if filename.endswith(".pkl") and now - os.path.getmtime(path) > self.ttl:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_pdf_cache() -> PDFCache:
+    """Get the process-wide PDF extraction cache (created on first use, expired entries are evicted then)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache = PDFCache(
+                    cache_dir=os.environ.get("OWID_COVID_PDF_CACHE_DIR", CACHE_DIR_DEFAULT),
+                    enabled=os.environ.get("OWID_COVID_PDF_CACHE", "on") != "off",
+                    ttl=int(os.environ.get("OWID_COVID_PDF_CACHE_TTL", CACHE_TTL_DEFAULT)),
+                )
+                if cache.enabled:
+                    cache.evict()
+                _cache = cache
+    return _cache
+
+
+def read_pdf_bytes(source, verify: bool = True, timeout: int = 30) -> bytes:
+    """Get the content of a PDF.
+
+    Args:
+        source (str or file-like): URL, local path or file object of the PDF.
+        verify (bool, optional): Verify TLS certificates (URLs only). Defaults to True.
+        timeout (int, optional): Request timeout in seconds (URLs only). Defaults to 30.
+
+    Returns:
+        bytes: PDF content.
+    """
+    if hasattr(source, "read"):
+        return source.read()
+    if source.startswith("http"):
+        return get_response(source, verify=verify, timeout=timeout).content
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def read_pdf_tables(source, verify: bool = True, **kwargs) -> list:
+    """Extract tables from a PDF with tabula (see `tabula.read_pdf`).
+
+    Args:
+        source (str or file-like): URL, local path or file object of the PDF.
+        verify (bool, optional): Verify TLS certificates (URLs only). Defaults to True.
+        kwargs: Arguments passed to `tabula.read_pdf` (e.g. `pages`, `area`, `lattice`, `pandas_options`).
+
+    Returns:
+        list: Tables (pd.DataFrame).
+    """
+    content = read_pdf_bytes(source, verify=verify)
+    cache = get_pdf_cache()
+    key = cache.key(content, "tables", kwargs)
+    dfs = cache.get(key)
+    if dfs is None:
+        with _tabula_lock:
+            dfs = tabula.read_pdf(io.BytesIO(content), **kwargs)
+        cache.set(key, dfs)
+    return dfs
+
+
+def read_pdf_text(source, verify: bool = True, **kwargs) -> str:
+    """Extract text from a PDF with pdfminer (see `pdfminer.high_level.extract_text`).
+
+    Args:
+        source (str or file-like): URL, local path or file object of the PDF.
+        verify (bool, optional): Verify TLS certificates (URLs only). Defaults to True.
+        kwargs: Arguments passed to `extract_text` (e.g. `page_numbers`, `maxpages`).
+
+    Returns:
+        str: Text.
+    """
+    content = read_pdf_bytes(source, verify=verify)
+    cache = get_pdf_cache()
+    key = cache.key(content, "text", kwargs)
+    text = cache.get(key)
+    if text is None:
+        text = extract_text(io.BytesIO(content), **kwargs)
+        cache.set(key, text)
+    return text
@@ -1,38 +1,99 @@
 """Most logic from:
 https://github.com/owid/walden/blob/master/owid/walden/owid_cache.py
+
+The S3 client is created once per process (and profile) and shared by all `S3` instances: boto3 clients are
+thread-safe, and creating one means opening a session and reading the AWS config. Transfers of large files use
+multipart uploads/downloads with concurrent parts (see `TRANSFER_CONFIG`), and several files can be transferred at once
+with `S3.upload_many` and `S3.download_many`.
+
+Uploads are skipped if the object in the bucket already has the same content: a SHA-256 digest of the content is stored
+in the object metadata, and compared with a HEAD request before uploading (objects uploaded without it are compared by
+ETag). See `get_upload_stats` for the number of bytes saved.
+
+Environment variables:
+
+    - OWID_COVID_S3_ENDPOINT: S3 endpoint. Defaults to DigitalOcean's. Set it to use a local S3-compatible server
+        (e.g. MinIO).
+    - AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY: If set, these credentials are used instead of the ~/.aws/config
+        profile.
+    - OWID_COVID_S3_SKIP_UNCHANGED: 'on' (default) or 'off'. Set to 'off' to always upload.
 """
 
+import hashlib
+import io
 import os
 import re
 import json
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from os import path
 from typing import Optional, Union
 
 import pandas as pd
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+from cowidev.utils.io import write_xlsx
 from cowidev.utils.log import get_logger
 
 
 logger = get_logger()
 
+SPACES_ENDPOINT = "https://nyc3.digitaloceanspaces.com"
+MAX_WORKERS = 6
+"""Number of files transferred concurrently by `S3.upload_many` / `S3.download_many`."""
+MAX_POOL_CONNECTIONS = 32
+"""Connections kept alive by the client (should cover MAX_WORKERS x TRANSFER_CONFIG.max_concurrency)."""
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=5,
+    use_threads=True,
+)
+"""Transfer settings: files over 16 MB are transferred in 16 MB parts, 5 parts at a time."""
+
+HEADER_MAX_BYTES = 64 * 1024
+"""Bytes read to get the header of a CSV, when reading only its tail."""
+SKIP_UNCHANGED = os.environ.get("OWID_COVID_S3_SKIP_UNCHANGED", "on") != "off"
+METADATA_DIGEST = "sha256"
+"""Object metadata field with the SHA-256 digest of the content."""
+
+_clients = {}
+_clients_lock = threading.Lock()
+_upload_stats = {"uploaded": 0, "bytes_uploaded": 0, "skipped": 0, "bytes_saved": 0}
+_upload_stats_lock = threading.Lock()
+
 
 class S3:
-    spaces_endpoint = "https://nyc3.digitaloceanspaces.com"
+    spaces_endpoint = os.environ.get("OWID_COVID_S3_ENDPOINT", SPACES_ENDPOINT)
 
     def __init__(self, profile_name="default"):
         self.client = self.connect(profile_name)
+        self.transfer_config = TRANSFER_CONFIG
+        self.skip_unchanged = SKIP_UNCHANGED
 
     def connect(self, profile_name="default"):
-        "Return a connection to Walden's DigitalOcean space."
-        self.check_for_default_profile()
-
-        session = boto3.Session(profile_name=profile_name)
+        "Return a connection to Walden's DigitalOcean space (shared by all instances in the process)."
+        key = (profile_name, self.spaces_endpoint)
+        if key not in _clients:
+            with _clients_lock:
+                if key not in _clients:
+                    _clients[key] = self._create_client(profile_name)
+        return _clients[key]
+
+    def _create_client(self, profile_name="default"):
+        if os.environ.get("AWS_ACCESS_KEY_ID"):
+            session = boto3.Session()
+        else:
+            self.check_for_default_profile()
+            session = boto3.Session(profile_name=profile_name)
         client = session.client(
             service_name="s3",
             endpoint_url=self.spaces_endpoint,
+            config=Config(max_pool_connections=MAX_POOL_CONNECTIONS, retries={"max_attempts": 5, "mode": "standard"}),
         )
         return client
 
@@ -66,17 +127,68 @@ class S3:
         print("Uploading to S3…")
         # Checks
         _check_s3_local_files(local_path, s3_path)
-        # Obtain bucket & file
-        bucket_name, s3_file = _url_to_path_and_bucket_mult(s3_path)
-        # Upload
-        extra_args = {"ACL": "public-read"} if public else {}
+        if isinstance(local_path, list):
+            self.upload_many(local_path, s3_path, public=public)
+            return None
+        self._upload(local_path, s3_path, public)
+        return None
+
+    def _upload(self, source, s3_path, public=False):
+        """Upload `source` (local path or bytes) to `s3_path`, unless the object already has the same content.
+
+        Note that if the content did not change, the object's ACL is not updated either.
+        """
+        bucket_name, s3_file = _url_to_path_and_bucket(s3_path)
+        digests = _get_digests(source, self.transfer_config.multipart_chunksize)
+        if self.skip_unchanged and self._is_unchanged(s3_path, digests):
+            logger.info(f"S3: {s3_path} unchanged, skipping upload.")
+            _add_upload_stats(skipped=1, bytes_saved=digests["size"])
+            return
+        extra_args = {"Metadata": {METADATA_DIGEST: digests["sha256"]}}
+        if public:
+            extra_args["ACL"] = "public-read"
         try:
-            self.client.upload_file(local_path, bucket_name, s3_file, ExtraArgs=extra_args)
+            if isinstance(source, bytes):
+                self.client.upload_fileobj(
+                    io.BytesIO(source), bucket_name, s3_file, ExtraArgs=extra_args, Config=self.transfer_config
+                )
+            else:
+                self.client.upload_file(
+                    source, bucket_name, s3_file, ExtraArgs=extra_args, Config=self.transfer_config
+                )
         except ClientError as e:
             logger.error(e)
             raise UploadError(e)
+        _add_upload_stats(uploaded=1, bytes_uploaded=digests["size"])
 
-        return None
+    def _is_unchanged(self, s3_path, digests) -> bool:
+        """Check if object at `s3_path` has the content described by `digests` (see `_get_digests`)."""
+        try:
+            metadata = self.get_metadata(s3_path)
+        except ClientError:
+            # Object does not exist (or can't be checked)
+            return False
+        if metadata.get("ContentLength") != digests["size"]:
+            return False
+        if METADATA_DIGEST in metadata.get("Metadata", {}):
+            return metadata["Metadata"][METADATA_DIGEST] == digests["sha256"]
+        # Objects uploaded before digests were stored. ETag is the MD5 of the content (single part uploads) or the MD5
+        # of the parts' MD5s followed by the number of parts (multipart uploads, only comparable if same part size)
+        etag = metadata.get("ETag", "").strip('"')
+        return etag in (digests["md5"], digests["md5_multipart"])
+
+    def upload_many(self, sources: list, s3_paths: list, public: bool = False, max_workers: int = MAX_WORKERS):
+        """Upload several files to S3 concurrently.
+
+        Args:
+            sources (list): Files to upload. Each one can be a local path (str) or the file content (bytes).
+            s3_paths (list): File destinations, same length as `sources`.
+            public (bool, optional): Set to True to expose the files to the public (read only). Defaults to False.
+            max_workers (int, optional): Maximum number of concurrent uploads. Defaults to MAX_WORKERS.
+        """
+        if len(sources) != len(s3_paths):
+            raise TypeError("`sources` and `s3_paths` should be of same length")
+        _run_many(lambda args: self._upload(*args, public=public), zip(sources, s3_paths), max_workers)
 
     def download_from_s3(self, s3_path: Union[str, list], local_path: Union[str, list]) -> Optional[str]:
         """Download file from S3.
@@ -88,15 +200,32 @@ class S3:
         print("Downloading from S3…")
         # Checks
         _check_s3_local_files(local_path, s3_path)
-        # Obtain bucket & file
-        bucket_name, s3_file = _url_to_path_and_bucket_mult(s3_path)
-        # Download
+        if isinstance(local_path, list):
+            self.download_many(s3_path, local_path)
+            return None
+        self._download(s3_path, local_path)
+        return None
+
+    def _download(self, s3_path, local_path):
+        bucket_name, s3_file = _url_to_path_and_bucket(s3_path)
         try:
-            self.client.download_file(bucket_name, s3_file, local_path)
+            self.client.download_file(bucket_name, s3_file, local_path, Config=self.transfer_config)
         except ClientError as e:
             logger.error(e)
             raise UploadError(e)
 
+    def download_many(self, s3_paths: list, local_paths: list, max_workers: int = MAX_WORKERS):
+        """Download several files from S3 concurrently.
+
+        Args:
+            s3_paths (list): File locations to download.
+            local_paths (list): Paths where to save files locally, same length as `s3_paths`.
+            max_workers (int, optional): Maximum number of concurrent downloads. Defaults to MAX_WORKERS.
+        """
+        if len(s3_paths) != len(local_paths):
+            raise TypeError("`s3_paths` and `local_paths` should be of same length")
+        _run_many(lambda args: self._download(*args), zip(s3_paths, local_paths), max_workers)
+
     def obj_to_s3(self, obj, s3_path, public=False, **kwargs):
         """Upload an object to S3, as a file.
 
@@ -111,49 +240,88 @@ class S3:
         Raises:
             ValueError: If file format is not supported.
         """
-        with tempfile.TemporaryDirectory() as f:
-            output_path = os.path.join(f, f"file")
-            if isinstance(obj, dict):
-                with open(output_path, "w") as f:
-                    json.dump(obj, f)
-            elif isinstance(obj, str):
-                with open(output_path, "w") as file:
-                    file.write(obj)
-            elif isinstance(obj, pd.DataFrame):
-                if s3_path.endswith(".csv") or s3_path.endswith(".zip"):
-                    obj.to_csv(output_path, index=False, **kwargs)
-                elif s3_path.endswith(".xls") or s3_path.endswith(".xlsx"):
-                    obj.to_excel(output_path, index=False, engine="xlsxwriter", **kwargs)
-                else:
-                    raise ValueError(f"pd.DataFrame must be exported to either CSV or XLS/XLSX!")
-            else:
-                raise ValueError(
-                    f"Type of `obj` is not supported ({type(obj).__name__}). Supported are json, str and pd.DataFrame"
-                )
-            self.upload_to_s3(local_path=output_path, s3_path=s3_path, public=public)
+        self._upload(obj_to_bytes(obj, s3_path, **kwargs), s3_path, public)
 
-    def obj_from_s3(self, s3_path, **kwargs):
+    def objs_to_s3(self, objs: list, s3_paths: list, public: bool = False, max_workers: int = MAX_WORKERS):
+        """Upload several objects to S3 concurrently (see `obj_to_s3`).
+
+        Args:
+            objs (list): Objects to upload.
+            s3_paths (list): Object S3 file destinations, same length as `objs`.
+            public (bool, optional): Set to True if files are to be publicly accessed. Defaults to False.
+            max_workers (int, optional): Maximum number of concurrent uploads. Defaults to MAX_WORKERS.
+        """
+        sources = [obj_to_bytes(obj, s3_path) for obj, s3_path in zip(objs, s3_paths)]
+        self.upload_many(sources, s3_paths, public=public, max_workers=max_workers)
+
+    def obj_from_s3(self, s3_path, byte_range: str = None, tail: int = None, **kwargs):
         """Load object from s3 location.
 
+        The object is parsed as it is downloaded (no local copy). CSVs are only read as far as needed (e.g. with
+        `nrows`), and only the columns in `usecols` are parsed.
+
         Args:
             s3_path (str): File location to load object from.
+            byte_range (str, optional): Only read this part of the object, as an HTTP range (e.g. 'bytes=0-1023').
+                                        Defaults to None (complete object).
+            tail (int, optional): Only read the last `tail` bytes of a CSV (e.g. the latest rows of a log). The header
+                                    is read separately and the first (incomplete) row is dropped, hence rows should not
+                                    have line breaks. Defaults to None (complete object).
+            kwargs: Arguments passed to `pd.read_csv` / `pd.read_excel` (e.g. `usecols`, `nrows`).
 
         Returns:
             object: File loaded as object. Currently JSON -> dict, CSV/XLS/XLSV -> pd.DataFrame, general -> str
         """
-        with tempfile.TemporaryDirectory() as f:
-            output_path = os.path.join(f, f"file")
-            self.download_from_s3(s3_path=s3_path, local_path=output_path)
+        if tail is not None:
+            if not s3_path.endswith(".csv"):
+                raise ValueError("`tail` is only supported for CSV files!")
+            return self._read_csv_tail(s3_path, tail, **kwargs)
+        body = self.get_body(s3_path, byte_range=byte_range)
+        try:
             if s3_path.endswith(".json"):
-                with open(output_path, "r") as f:
-                    return json.load(f)
+                return json.load(body)
             elif s3_path.endswith(".csv"):
-                return pd.read_csv(output_path, **kwargs)
+                return pd.read_csv(body, **kwargs)
             elif s3_path.endswith(".xls") or s3_path.endswith(".xlsx"):
-                return pd.read_excel(output_path, **kwargs)
+                # Excel readers need a seekable file
+                return pd.read_excel(io.BytesIO(body.read()), **kwargs)
             else:
-                with open(output_path, "r") as f:
-                    return f.read()
+                return body.read().decode()
+        finally:
+            # Stops the download if the object was not read until the end
+            body.close()
+
+    def get_body(self, s3_path, byte_range: str = None):
+        """Get the content of an object as a stream.
+
+        Args:
+            s3_path (str): File location to load object from.
+            byte_range (str, optional): Only get this part of the object, as an HTTP range (e.g. 'bytes=0-1023' or
+                                        'bytes=-1024' for the last 1024 bytes). Defaults to None (complete object).
+
+        Returns:
+            botocore.response.StreamingBody: File-like object. Close it if it is not read until the end.
+        """
+        bucket_name, s3_file = _url_to_path_and_bucket(s3_path)
+        kwargs = {"Range": byte_range} if byte_range else {}
+        try:
+            response = self.client.get_object(Bucket=bucket_name, Key=s3_file, **kwargs)
+        except ClientError as e:
+            logger.error(e)
+            raise UploadError(e)
+        return response["Body"]
+
+    def _read_csv_tail(self, s3_path, nbytes, **kwargs):
+        size = self.get_metadata(s3_path)["ContentLength"]
+        if size <= nbytes:
+            return self.obj_from_s3(s3_path, **kwargs)
+        # Header (first line)
+        body = self.get_body(s3_path, byte_range=f"bytes=0-{min(HEADER_MAX_BYTES, size) - 1}")
+        header = body.read().split(b"\n", 1)[0]
+        body.close()
+        # Complete rows in the last `nbytes` bytes
+        rows = self.get_body(s3_path, byte_range=f"bytes=-{nbytes}").read().split(b"\n", 1)[-1]
+        return pd.read_csv(io.BytesIO(header + b"\n" + rows), **kwargs)
 
     def get_metadata(self, s3_path):
         """Get metadata from file `s3_path`
@@ -169,6 +337,108 @@ class S3:
         return response
 
 
+def obj_to_bytes(obj, s3_path: str, **kwargs) -> bytes:
+    """Serialize an object as the content of file `s3_path` (see `S3.obj_to_s3`).
+
+    Args:
+        obj (object): dict -> JSON, str -> text, DataFrame -> CSV/XLSX/XLS/ZIP depending on `s3_path` value.
+        s3_path (str): Object S3 file destination.
+        kwargs: Arguments passed to the pandas export method (DataFrames only). XLS/XLSX files are written with
+                `cowidev.utils.io.write_xlsx` (constant memory), unless arguments other than `sheet_name` are given.
+
+    Raises:
+        ValueError: If file format is not supported.
+
+    Returns:
+        bytes: File content.
+    """
+    if isinstance(obj, dict):
+        return json.dumps(obj).encode()
+    elif isinstance(obj, str):
+        return obj.encode()
+    elif isinstance(obj, pd.DataFrame):
+        buffer = io.BytesIO()
+        if s3_path.endswith(".csv") or s3_path.endswith(".zip"):
+            obj.to_csv(buffer, index=False, **kwargs)
+        elif s3_path.endswith(".xls") or s3_path.endswith(".xlsx"):
+            if set(kwargs) - {"sheet_name"}:
+                # Options only supported by pandas (e.g. `float_format`, `freeze_panes`)
+                obj.to_excel(buffer, index=False, engine="xlsxwriter", **kwargs)
+                return buffer.getvalue()
+            with tempfile.TemporaryDirectory() as tmp:
+                output_path = os.path.join(tmp, "file.xlsx")
+                write_xlsx(obj, output_path, **kwargs)
+                with open(output_path, "rb") as f:
+                    return f.read()
+        else:
+            raise ValueError(f"pd.DataFrame must be exported to either CSV or XLS/XLSX!")
+        return buffer.getvalue()
+    raise ValueError(
+        f"Type of `obj` is not supported ({type(obj).__name__}). Supported are json, str and pd.DataFrame"
+    )
+
+
+def _get_digests(source, chunksize: int) -> dict:
+    """Get size, SHA-256 and MD5 (single and multipart ETag) of `source` (local path or bytes), in one pass."""
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    md5_parts = []
+    size = 0
+    f = io.BytesIO(source) if isinstance(source, bytes) else open(source, "rb")
+    with f:
+        for chunk in iter(lambda: f.read(chunksize), b""):
+            sha256.update(chunk)
+            md5.update(chunk)
+            md5_parts.append(hashlib.md5(chunk).digest())
+            size += len(chunk)
+    return {
+        "size": size,
+        "sha256": sha256.hexdigest(),
+        "md5": md5.hexdigest(),
+        "md5_multipart": f"{hashlib.md5(b''.join(md5_parts)).hexdigest()}-{len(md5_parts)}",
+    }
+
+
+def _add_upload_stats(**kwargs):
+    with _upload_stats_lock:
+        for k, v in kwargs.items():
+            _upload_stats[k] += v
+
+
+def get_upload_stats(reset: bool = False) -> dict:
+    """Get upload counters of the process: files uploaded, files skipped because unchanged and their sizes.
+
+    Args:
+        reset (bool, optional): Set counters back to zero. Defaults to False.
+
+    Returns:
+        dict: Counters `uploaded`, `bytes_uploaded`, `skipped` and `bytes_saved`.
+    """
+    with _upload_stats_lock:
+        stats = dict(_upload_stats)
+        if reset:
+            for k in _upload_stats:
+                _upload_stats[k] = 0
+    return stats
+
+
+def print_upload_stats(reset: bool = False):
+    """Print a summary of `get_upload_stats`."""
+    stats = get_upload_stats(reset=reset)
+    print(
+        f"S3: {stats['uploaded']} files uploaded ({stats['bytes_uploaded'] / 1e6:.1f} MB),"
+        f" {stats['skipped']} unchanged files skipped ({stats['bytes_saved'] / 1e6:.1f} MB saved)"
+    )
+
+
+def _run_many(func, args, max_workers):
+    """Run `func` on all `args` in a thread pool. Errors are raised once all calls are done."""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(func, a) for a in args]
+    for future in futures:
+        future.result()
+
+
 def _url_to_path_and_bucket(s3_path):
     """Check if S3 path format is correct"""
     r = "^s3:\/\/([^\/]+)\/((:?(.+)\/)?[^\/]+)$"
@@ -197,49 +467,63 @@ def _check_s3_local_files(local_file, s3_path):
     if type(local_file) is not type(s3_path):
         raise TypeError("`local_file` and `s3_path` should be of the same type")
     if isinstance(local_file, list):
-        if len(local_file) == len(s3_path):
+        if len(local_file) != len(s3_path):
             raise TypeError("`local_file` and `s3_path` should be of same length")
     elif not isinstance(local_file, str):
         raise TypeError("`local_file` and `s3_path` should be of type str or list")
 
 
+_s3 = None
+_s3_lock = threading.Lock()
+
+
+def get_s3() -> S3:
+    """Get the process-wide S3 instance (default profile)."""
+    global _s3
+    if _s3 is None:
+        with _s3_lock:
+            if _s3 is None:
+                _s3 = S3()
+    return _s3
+
+
 def obj_to_s3(data: dict, s3_path: str = None, public: bool = False, **kwargs) -> Optional[str]:
-    s3 = S3()
+    s3 = get_s3()
     s3.obj_to_s3(data, s3_path, public, **kwargs)
 
 
-def obj_from_s3(s3_path: Union[str, list], **kwargs) -> dict:
-    s3 = S3()
-    return s3.obj_from_s3(s3_path, **kwargs)
+def obj_from_s3(s3_path: Union[str, list], byte_range: str = None, tail: int = None, **kwargs) -> dict:
+    s3 = get_s3()
+    return s3.obj_from_s3(s3_path, byte_range=byte_range, tail=tail, **kwargs)
 
 
 def dict_to_s3(data: dict, s3_path: str = None, public: bool = False, **kwargs) -> Optional[str]:
     """Deprecated. Use `obj_to_s3` instead"""
-    s3 = S3()
+    s3 = get_s3()
     s3.obj_to_s3(data, s3_path, public, **kwargs)
 
 
 def str_to_s3(text: str, s3_path: str = None, public: bool = False, **kwargs) -> Optional[str]:
     """Deprecated. Use `obj_to_s3` instead"""
-    s3 = S3()
+    s3 = get_s3()
     s3.obj_to_s3(text, s3_path, public, **kwargs)
 
 
 def df_to_s3(df: pd.DataFrame, s3_path: str = None, public: bool = False, **kwargs) -> Optional[str]:
     """Deprecated. Use `obj_to_s3` instead"""
-    s3 = S3()
+    s3 = get_s3()
     s3.obj_to_s3(df, s3_path, public, **kwargs)
 
 
 def dict_from_s3(s3_path: Union[str, list], **kwargs) -> dict:
     """Deprecated. Use `obj_from_s3` instead"""
-    s3 = S3()
+    s3 = get_s3()
     return s3.obj_from_s3(s3_path, **kwargs)
 
 
 def df_from_s3(s3_path: Union[str, list], **kwargs) -> Optional[str]:
     """Deprecated. Use `obj_from_s3` instead"""
-    s3 = S3()
+    s3 = get_s3()
     return s3.obj_from_s3(s3_path, **kwargs)
 
 
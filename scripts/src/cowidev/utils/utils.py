@@ -13,6 +13,9 @@ from cowidev import PATHS
 from cowidev.utils.web.download import download_file_from_url
 
 
+FLOAT32_MAX_INTEGER = 2**24
+
+
 def make_monotonic(
     df: pd.DataFrame, column_date: str, column_metrics: list, max_removed_rows=10, strict=False
 ) -> pd.DataFrame:
@@ -92,6 +95,68 @@ def pd_series_diff_values(a, b):
     return {*set(a[-a.isin(common)]), *set(b[-b.isin(common)])}
 
 
+def latest_values(df: pd.DataFrame, by="location", sort_by="date", skipna: bool = True) -> pd.DataFrame:
+    """Get the latest values of each group, in a single pass.
+
+    Args:
+        df (pd.DataFrame): Data.
+        by (str or list, optional): Group column(s). Defaults to "location".
+        sort_by (str or list, optional): Column(s) defining which values are the latest. If None, rows are assumed to
+                                            be sorted already. Defaults to "date".
+        skipna (bool, optional): If True, get the last non-null value of each column (i.e. same as
+                                    `df_group.ffill().tail(1)`). Otherwise, get the last row of each group. Defaults to
+                                    True.
+
+    Returns:
+        pd.DataFrame: One row per group, sorted by `by`. Same columns as `df`.
+    """
+    if sort_by is not None:
+        df = df.sort_values(sort_by, kind="mergesort")
+    if skipna:
+        df_latest = df.groupby(by, sort=True, observed=True).last().reset_index()
+    else:
+        df_latest = df.drop_duplicates(subset=by, keep="last").sort_values(by, kind="mergesort")
+    return df_latest[df.columns].reset_index(drop=True)
+
+
+def compact_dtypes(df: pd.DataFrame, categorical: list = None) -> pd.DataFrame:
+    """Reduce the memory used by `df`, without changing its values (nor how they are written to CSV, XLSX or JSON).
+
+    - Columns in `categorical` are converted to categorical (e.g. location names, repeated for every date).
+    - Float columns with only integer values below 2^24 (e.g. daily counts) are converted to float32, which represents
+      them exactly.
+
+    Counts are not converted to nullable integers: these would be written as "5" instead of "5.0", and take more
+    memory than float32 (4 bytes plus a mask byte per value). Non-integer floats are kept as float64, so that rounded
+    values do not change.
+
+    Arithmetic with float32 columns is done in float32: cast them to float before multiplying or dividing them. Group
+    by categorical columns with `observed=True`.
+
+    Args:
+        df (pd.DataFrame): Data.
+        categorical (list, optional): Columns to convert to categorical. Defaults to None.
+
+    Returns:
+        pd.DataFrame: Data with compact dtypes. Same index and columns as `df`.
+    """
+    categorical = set(categorical or [])
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if col in categorical:
+            values = values.astype("category")
+        elif values.dtype == "float64" and _is_float32_integer(values):
+            values = values.astype("float32")
+        columns[col] = values
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _is_float32_integer(values: pd.Series) -> bool:
+    # All non-null values are integers that float32 represents exactly
+    return values.abs().max() <= FLOAT32_MAX_INTEGER and (values.dropna() % 1 == 0).all()
+
+
 def dict_to_compact_json(d: dict):
     """
     Encodes a Python dict into valid, minified JSON.
@@ -1,5 +1,5 @@
-from .scraping import get_soup, get_driver, request_json
+from .scraping import get_soup, get_driver, request_json, request_json_items
 from .download import read_xlsx_from_url, get_base_url
 
 
-__all__ = ["get_soup", "get_driver", "request_json", "read_xlsx_from_url", "get_base_url"]
+__all__ = ["get_soup", "get_driver", "request_json", "request_json_items", "read_xlsx_from_url", "get_base_url"]
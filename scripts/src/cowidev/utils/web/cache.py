@@ -0,0 +1,344 @@
+"""On-disk HTTP response cache.
+
+Responses are stored content-addressed: bodies live under `blobs/` named after their SHA-256 digest, and each cached
+request (URL + params) has a small JSON entry under `entries/` pointing to its body, together with the validators
+(`ETag`, `Last-Modified`) sent by the server. Later requests send `If-None-Match`/`If-Modified-Since`, and on a 304 the
+stored body is used instead of downloading it again. Request headers that can change the response (e.g. `Accept`,
+`Authorization`, `Range`) are also part of the cache key.
+
+Expired entries are evicted on first use in each process. Only one process evicts at a time (an exclusive lock on
+`evict.lock` is held), and bodies written or used in the last `EVICT_GRACE_PERIOD` seconds are never deleted, so that
+concurrent fetchers do not lose the body they just stored.
+
+The cache is configured via environment variables:
+
+    - OWID_COVID_HTTP_CACHE: Cache mode. 'on' (default), 'off' or 'offline'. In 'offline' mode no request is sent at
+                             all, and responses are replayed from the cache (a `CacheMissError` is raised if a URL was
+                             never cached).
+    - OWID_COVID_HTTP_CACHE_DIR: Cache folder. Defaults to ~/.cache/owid/http.
+    - OWID_COVID_HTTP_CACHE_TTL: Entries not used for this many seconds are evicted. Defaults to 7 days.
+    - OWID_COVID_HTTP_CACHE_MAX_SIZE: Maximum size of the stored bodies, in bytes. Least recently used entries are
+                                      evicted first. Defaults to 2 GB.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+CACHE_MODES = ["on", "off", "offline"]
+CACHE_DIR_DEFAULT = os.path.join(os.path.expanduser("~"), ".cache", "owid", "http")
+CACHE_TTL_DEFAULT = 7 * 24 * 3600
+CACHE_MAX_SIZE_DEFAULT = 2 * 1024**3
+CHUNK_SIZE = 1024 * 1024
+EVICT_GRACE_PERIOD = 3600
+"""Bodies modified in the last `EVICT_GRACE_PERIOD` seconds are not evicted (they may be in use by another process)."""
+# Request headers that do not change the response body (not part of the cache key)
+KEY_IGNORED_HEADERS = {
+    "accept-encoding",
+    "cache-control",
+    "connection",
+    "if-modified-since",
+    "if-none-match",
+    "pragma",
+    "upgrade-insecure-requests",
+    "user-agent",
+}
+
+
+class CacheMissError(Exception):
+    pass
+
+
+class ResponseCache:
+    """Content-addressed HTTP response cache with conditional requests.
+
+    Args:
+        cache_dir (str): Folder where responses are stored.
+        mode (str, optional): Cache mode. 'on', 'off' or 'offline'. Defaults to 'on'.
+        ttl (int, optional): Entries not used in the last `ttl` seconds are evicted. Defaults to CACHE_TTL_DEFAULT.
+        max_size (int, optional): Maximum total size of stored bodies (bytes). Defaults to CACHE_MAX_SIZE_DEFAULT.
+    """
+
+    def __init__(
+        self, cache_dir: str, mode: str = "on", ttl: int = CACHE_TTL_DEFAULT, max_size: int = CACHE_MAX_SIZE_DEFAULT
+    ):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Invalid cache mode: {mode}. Valid modes are {CACHE_MODES}")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    @property
+    def offline(self):
+        return self.mode == "offline"
+
+    @property
+    def _entries_dir(self):
+        return os.path.join(self.cache_dir, "entries")
+
+    @property
+    def _blobs_dir(self):
+        return os.path.join(self.cache_dir, "blobs")
+
+    def key(self, url: str, params: dict = None, headers: dict = None) -> str:
+        """Build cache key from `url`, request `params` and the request `headers` that can change the response."""
+        params = sorted((str(k), str(v)) for k, v in (params or {}).items())
+        headers = sorted(
+            (str(k).lower(), str(v)) for k, v in (headers or {}).items() if str(k).lower() not in KEY_IGNORED_HEADERS
+        )
+        raw = json.dumps([url, params, headers])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self._entries_dir, f"{key}.json")
+
+    def _blob_path(self, digest):
+        return os.path.join(self._blobs_dir, digest[:2], digest)
+
+    def _load_entry(self, key):
+        try:
+            with open(self._entry_path(key)) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if not os.path.isfile(self._blob_path(entry["digest"])):
+            return None
+        return entry
+
+    def _write_entry(self, key, entry):
+        os.makedirs(self._entries_dir, exist_ok=True)
+        _write_atomic(self._entry_path(key), json.dumps(entry).encode())
+
+    def _conditional_headers(self, entry):
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def _store_body(self, response: requests.Response) -> Tuple[str, int]:
+        """Stream the body of `response` into the blob store. Returns its digest and size."""
+        os.makedirs(self._blobs_dir, exist_ok=True)
+        sha = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=self._blobs_dir, delete=False) as tmp:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                sha.update(chunk)
+                size += len(chunk)
+                tmp.write(chunk)
+        digest = sha.hexdigest()
+        blob_path = self._blob_path(digest)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(tmp.name, blob_path)
+        return digest, size
+
+    def fetch(self, url: str, send, params: dict = None, headers: dict = None) -> Tuple[requests.Response, str]:
+        """Get the response for `url`, using the cached body if it has not changed.
+
+        Args:
+            url (str): Request URL.
+            send (callable): Function sending the actual GET request. It receives the request headers and should
+                                return a streamed `requests.Response` (i.e. `stream=True`).
+            params (dict, optional): Request parameters (part of the cache key). Defaults to None.
+            headers (dict, optional): Request headers (part of the cache key, except `KEY_IGNORED_HEADERS`). Defaults
+                                        to None.
+
+        Returns:
+            Tuple[requests.Response, str]: Response (with status 200 if the body came from the cache) and path to the
+                                            stored body. Path is None if the response could not be cached.
+        """
+        key = self.key(url, params, headers)
+        entry = self._load_entry(key)
+        if self.offline:
+            if entry is None:
+                raise CacheMissError(f"Offline mode: no cached response for {url} (params: {params})")
+            return _build_response(url, entry), self._blob_path(entry["digest"])
+        response = send({**(headers or {}), **self._conditional_headers(entry)})
+        if response.status_code == 304 and entry is not None:
+            response.close()
+            entry["accessed_at"] = time.time()
+            self._write_entry(key, entry)
+            # Body in use: protect it from eviction by other processes
+            _touch(self._blob_path(entry["digest"]))
+            return _build_response(url, entry, response), self._blob_path(entry["digest"])
+        if not response.ok:
+            return response, None
+        digest, size = self._store_body(response)
+        entry = {
+            "url": url,
+            "digest": digest,
+            "size": size,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_type": response.headers.get("Content-Type"),
+            "fetched_at": time.time(),
+            "accessed_at": time.time(),
+        }
+        self._write_entry(key, entry)
+        return _build_response(url, entry, response), self._blob_path(digest)
+
+    def evict(self):
+        """Remove expired entries, shrink the cache below `max_size` and delete unreferenced bodies.
+
+        Skipped if another process is evicting already. Bodies modified in the last `EVICT_GRACE_PERIOD` seconds are
+        kept, even if unreferenced.
+        """
+        if not os.path.isdir(self._entries_dir):
+            return
+        with self._lock, open(os.path.join(self.cache_dir, "evict.lock"), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            try:
+                entries = self._load_entries_unexpired()
+                digests = self._shrink(entries)
+                self._remove_unreferenced_blobs(digests)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_entries_unexpired(self) -> list:
+        """Load entries, removing those expired or invalid. Returns (path, entry) tuples."""
+        now = time.time()
+        entries = []
+        for filename in os.listdir(self._entries_dir):
+            path = os.path.join(self._entries_dir, filename)
+            try:
+                with open(path) as f:
+                    entry = json.load(f)
+            except (FileNotFoundError, ValueError):
+                # Also removes temporary files, if older than the grace period
+                if _age(path) > EVICT_GRACE_PERIOD:
+                    _remove(path)
+                continue
+            if now - entry.get("accessed_at", 0) > self.ttl:
+                _remove(path)
+            else:
+                entries.append((path, entry))
+        return entries
+
+    def _shrink(self, entries: list) -> set:
+        """Remove least recently used entries beyond `max_size`. Returns the digests of the bodies kept."""
+        entries = sorted(entries, key=lambda x: x[1]["accessed_at"], reverse=True)
+        size = 0
+        digests = set()
+        for path, entry in entries:
+            if entry["digest"] not in digests:
+                size += entry["size"]
+            if size > self.max_size:
+                _remove(path)
+            else:
+                digests.add(entry["digest"])
+        return digests
+
+    def _remove_unreferenced_blobs(self, digests: set):
+        """Remove bodies not in `digests`, unless modified in the last `EVICT_GRACE_PERIOD` seconds."""
+        for root, _, filenames in os.walk(self._blobs_dir):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                if filename not in digests and _age(path) > EVICT_GRACE_PERIOD:
+                    _remove(path)
+
+
+def _build_response(url, entry, response=None):
+    """Build a 200 response for the body stored in the cache.
+
+    The body is not loaded, use `load_cached_content` to do so.
+    """
+    if response is None:
+        response = requests.Response()
+        response.url = url
+        response.reason = "OK (cached)"
+        response.headers = CaseInsensitiveDict()
+    if entry.get("content_type"):
+        response.headers["Content-Type"] = entry["content_type"]
+    response.status_code = 200
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.raw = None
+    response._content = False
+    response._content_consumed = False
+    response._cache_entry = entry
+    return response
+
+
+def load_cached_content(response: requests.Response, body_path: str) -> requests.Response:
+    """Load the body stored at `body_path` into `response`."""
+    with open(body_path, "rb") as f:
+        response._content = f.read()
+    response._content_consumed = True
+    return response
+
+
+def _write_atomic(path, data: bytes):
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as tmp:
+        tmp.write(data)
+    os.replace(tmp.name, path)
+
+
+def _age(path) -> float:
+    """Seconds since `path` was last modified (0 if it does not exist)."""
+    try:
+        return time.time() - os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResponseCache:
+    """Get the process-wide response cache (created on first use, expired entries are evicted then)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache = ResponseCache(
+                    cache_dir=os.environ.get("OWID_COVID_HTTP_CACHE_DIR", CACHE_DIR_DEFAULT),
+                    mode=os.environ.get("OWID_COVID_HTTP_CACHE", "on"),
+                    ttl=int(os.environ.get("OWID_COVID_HTTP_CACHE_TTL", CACHE_TTL_DEFAULT)),
+                    max_size=int(os.environ.get("OWID_COVID_HTTP_CACHE_MAX_SIZE", CACHE_MAX_SIZE_DEFAULT)),
+                )
+                if cache.enabled:
+                    cache.evict()
+                _cache = cache
+    return _cache
+
+
+def set_cache_mode(mode: str):
+    """Set the mode of the process-wide response cache ('on', 'off' or 'offline')."""
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Invalid cache mode: {mode}. Valid modes are {CACHE_MODES}")
+    os.environ["OWID_COVID_HTTP_CACHE"] = mode
+    get_cache().mode = mode
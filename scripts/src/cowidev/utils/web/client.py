@@ -0,0 +1,149 @@
+"""Shared HTTP client for `cowidev.utils.web`.
+
+All requests go through one process-wide `requests.Session`, so that connections to the same host are kept alive and
+reused across country modules (we hit a few dozen hosts repeatedly: ECDC, WHO, GitHub raw, etc.). Concurrent requests
+to the same host are bounded, so that running many modules in parallel does not get us throttled.
+
+Modules that want to fetch several resources at once can use the asyncio path (see `HTTPClient.request_async` and
+`cowidev.utils.web.scraping.get_responses`).
+"""
+import asyncio
+import threading
+from contextlib import contextmanager
+from functools import partial
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+POOL_CONNECTIONS = 64
+"""Number of per-host connection pools kept alive."""
+POOL_MAXSIZE = 8
+"""Maximum number of connections kept alive per host."""
+MAX_REQUESTS_PER_HOST = 8
+"""Maximum number of in-flight requests per host."""
+
+
+class HTTPClient:
+    """Pooled HTTP client with bounded per-host concurrency.
+
+    Args:
+        pool_connections (int, optional): Number of per-host connection pools to cache. Defaults to POOL_CONNECTIONS.
+        pool_maxsize (int, optional): Connections kept alive per host. Defaults to POOL_MAXSIZE.
+        max_requests_per_host (int, optional): Maximum number of concurrent requests to the same host. Defaults to
+                                                MAX_REQUESTS_PER_HOST.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = POOL_CONNECTIONS,
+        pool_maxsize: int = POOL_MAXSIZE,
+        max_requests_per_host: int = MAX_REQUESTS_PER_HOST,
+    ):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_requests_per_host = max_requests_per_host
+        self.session = self._build_session(HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize))
+        self._sessions_custom = {}
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _build_session(self, adapter, prefixes=("https://", "http://")):
+        session = requests.Session()
+        for prefix in prefixes:
+            session.mount(prefix, adapter)
+        return session
+
+    def session_for(self, base_url: str, adapter_cls):
+        """Get a session which uses `adapter_cls` for requests to `base_url`.
+
+        Used for hosts that need a special transport (e.g. legacy TLS ciphers, see `DESAdapter`). Sessions are cached,
+        so connections to these hosts are also reused.
+        """
+        key = (base_url, adapter_cls)
+        with self._lock:
+            if key not in self._sessions_custom:
+                adapter = adapter_cls(pool_connections=1, pool_maxsize=self.pool_maxsize)
+                self._sessions_custom[key] = self._build_session(adapter, prefixes=(base_url,))
+            return self._sessions_custom[key]
+
+    def _semaphore(self, url: str):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_requests_per_host)
+            return self._semaphores[host]
+
+    @contextmanager
+    def host_slot(self, url: str):
+        """Hold one of the request slots of `url`'s host.
+
+        Use it when consuming a streamed response, so that the slot is held until the body has been read.
+        """
+        semaphore = self._semaphore(url)
+        with semaphore:
+            yield
+
+    def request(self, method: str, url: str, session: requests.Session = None, **kwargs) -> requests.Response:
+        """Send a request using the shared connection pools.
+
+        Args:
+            method (str): HTTP method (e.g. 'get', 'post').
+            url (str): Request URL.
+            session (requests.Session, optional): Session to use. Defaults to the shared session.
+            kwargs: Arguments passed to `requests.Session.request`.
+
+        Returns:
+            requests.Response: Response.
+        """
+        if session is None:
+            session = self.session
+        with self.host_slot(url):
+            return session.request(method, url, **kwargs)
+
+    async def request_async(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Asynchronous version of `request`. Runs the request in the event loop's default executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(self.request, method, url, **kwargs))
+
+    def close(self):
+        """Close all pooled connections."""
+        with self._lock:
+            self.session.close()
+            for session in self._sessions_custom.values():
+                session.close()
+            self._sessions_custom = {}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HTTPClient:
+    """Get the process-wide HTTP client (created on first use)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HTTPClient()
+    return _client
+
+
+def init_client(**kwargs) -> HTTPClient:
+    """Create the process-wide HTTP client with custom settings, replacing the current one.
+
+    Call it before any request is sent (e.g. at startup, or as initializer of worker processes).
+
+    Args:
+        kwargs: Arguments passed to `HTTPClient`.
+
+    Returns:
+        HTTPClient: New client.
+    """
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = HTTPClient(**kwargs)
+    return _client
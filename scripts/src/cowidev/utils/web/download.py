@@ -1,11 +1,15 @@
-import tempfile
+from contextlib import contextmanager
+import io
+import shutil
 from urllib.parse import urlparse
 import pandas as pd
 
-import requests
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.ssl_ import create_urllib3_context
 
+from cowidev.utils.web.cache import get_cache
+from cowidev.utils.web.client import get_client
+
 
 CIPHERS = "HIGH:!DH:!aNULL:DEFAULT@SECLEVEL=1"
 
@@ -15,6 +19,8 @@ def read_xlsx_from_url(
 ) -> pd.DataFrame:
     """Download and load xls file from URL.
 
+    The file is parsed from memory (or from the HTTP cache), no temporary file is written.
+
     Args:
         url (str): File url.
         as_series (bol): Set to True to return a pandas.Series object. Source file must be of shape 1xN (1 row, N
@@ -24,9 +30,10 @@ def read_xlsx_from_url(
     Returns:
         pandas.DataFrame: Data loaded.
     """
-    with tempfile.NamedTemporaryFile() as tmp:
-        download_file_from_url(url, tmp.name, timeout=timeout, verify=verify, ciphers_low=ciphers_low)
-        df = pd.read_excel(tmp.name, **kwargs)
+    with open_url(url, timeout=timeout, verify=verify, ciphers_low=ciphers_low) as f:
+        if not f.seekable():
+            f = io.BytesIO(f.read())
+        df = pd.read_excel(f, **kwargs)
     if as_series:
         return df.T.squeeze()
     if drop:
@@ -34,25 +41,77 @@ def read_xlsx_from_url(
     return df
 
 
-def read_csv_from_url(url, timeout=30, verify=True, ciphers_low=False, **kwargs):
-    with tempfile.NamedTemporaryFile(mode="w+", delete=False) as tmp:
-        download_file_from_url(url, tmp.name, timeout=timeout, verify=verify, ciphers_low=ciphers_low)
-        df = pd.read_csv(tmp.name, **kwargs)
+def read_csv_from_url(url, timeout=30, verify=True, ciphers_low=False, chunksize=None, **kwargs):
+    """Load csv file from URL.
+
+    The file is parsed as it is streamed (or read from the HTTP cache), no temporary file is written. Use pandas'
+    `usecols` and `dtype` to only load the required columns with their final types.
+
+    Args:
+        url (str): File url.
+        chunksize (int, optional): If given, an iterator over DataFrames of `chunksize` rows is returned instead, so
+                                    that large files can be processed without loading them completely. Defaults to
+                                    None.
+        kwargs: Arguments for pandas.read_csv.
+
+    Returns:
+        pandas.DataFrame: Data loaded.
+    """
+    if chunksize is not None:
+        return _iter_csv_from_url(url, timeout, verify, ciphers_low, chunksize, **kwargs)
+    with open_url(url, timeout=timeout, verify=verify, ciphers_low=ciphers_low) as f:
+        df = pd.read_csv(f, **kwargs)
     # df = df.dropna(how="all")
     return df
 
 
-def download_file_from_url(url, save_path, chunk_size=1024 * 1024, timeout=30, verify=True, ciphers_low=False):
+def _iter_csv_from_url(url, timeout, verify, ciphers_low, chunksize, **kwargs):
+    with open_url(url, timeout=timeout, verify=verify, ciphers_low=ciphers_low) as f:
+        for df in pd.read_csv(f, chunksize=chunksize, **kwargs):
+            yield df
+
+
+@contextmanager
+def open_url(url, timeout=30, verify=True, ciphers_low=False):
+    """Open content at `url` as a binary file-like object.
+
+    If the response is in the HTTP cache, the cached file is opened. Otherwise, the response body is streamed.
+
+    Args:
+        url (str): File url.
+        timeout (int, optional): Request timeout, in seconds. Defaults to 30.
+        verify (bool, optional): Verify SSL certificates. Defaults to True.
+        ciphers_low (bool, optional): Use legacy TLS ciphers (see `DESAdapter`). Defaults to False.
+    """
+    client = get_client()
     if ciphers_low:
-        base_url = get_base_url(url)
-        s = requests.Session()
-        s.mount(base_url, DESAdapter())
-        r = s.get(url)
+        session = client.session_for(get_base_url(url), DESAdapter)
     else:
-        r = requests.get(url, stream=True, timeout=timeout, verify=verify)
-    with open(save_path, "wb") as fd:
-        for chunk in r.iter_content(chunk_size=chunk_size):
-            fd.write(chunk)
+        session = client.session
+    cache = get_cache()
+    with client.host_slot(url):
+        if cache.enabled:
+            r, body_path = cache.fetch(
+                url, lambda headers: session.get(url, headers=headers, stream=True, timeout=timeout, verify=verify)
+            )
+        else:
+            r = session.get(url, stream=True, timeout=timeout, verify=verify)
+            body_path = None
+        if body_path is None:
+            r.raw.decode_content = True
+            try:
+                yield r.raw
+            finally:
+                r.close()
+            return
+    with open(body_path, "rb") as f:
+        yield f
+
+
+def download_file_from_url(url, save_path, chunk_size=1024 * 1024, timeout=30, verify=True, ciphers_low=False):
+    with open_url(url, timeout=timeout, verify=verify, ciphers_low=ciphers_low) as f:
+        with open(save_path, "wb") as fd:
+            shutil.copyfileobj(f, fd, chunk_size)
 
 
 class DESAdapter(HTTPAdapter):
@@ -0,0 +1,236 @@
+"""Pool of warm Selenium browsers.
+
+Starting a browser takes several seconds, which is among the largest per-module costs of the `get` step. Instead,
+`get_driver` leases a browser from a bounded pool, and returns it when the `with` block ends. Browsers are reset
+between leases (cookies, windows, download folder) and recycled after a number of uses, or if they crashed.
+"""
+import shutil
+import tempfile
+import threading
+import time
+
+from cowidev.utils.log import get_logger
+
+
+logger = get_logger()
+
+POOL_SIZE = 2
+"""Maximum number of browsers alive (and leased) at the same time."""
+MAX_USES = 20
+"""Number of leases after which a browser is quit and replaced with a fresh one."""
+LEASE_TIMEOUT = 600
+"""Maximum time (seconds) waiting for a browser to be available."""
+
+
+class LeasedDriver:
+    """Selenium driver leased from a `DriverPool`.
+
+    Behaves like the underlying driver. Quitting it (or leaving its `with` block) returns it to the pool instead of
+    closing the browser.
+    """
+
+    def __init__(self, pool, driver, key, download_folder=None):
+        self._pool = pool
+        self._driver = driver
+        self._key = key
+        self._download_folder = download_folder
+        self._crashed = False
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            # Browser state is unknown after an error, do not reuse
+            self._crashed = True
+        self.quit()
+
+    def quit(self):
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.release(self)
+
+
+class DriverPool:
+    """Bounded pool of warm Selenium browsers.
+
+    Args:
+        max_size (int, optional): Maximum number of browsers alive at the same time. Defaults to POOL_SIZE.
+        max_uses (int, optional): Number of leases after which a browser is recycled. Defaults to MAX_USES.
+        lease_timeout (float, optional): Maximum time (seconds) `lease` waits for a browser. Defaults to LEASE_TIMEOUT.
+    """
+
+    def __init__(self, max_size: int = POOL_SIZE, max_uses: int = MAX_USES, lease_timeout: float = LEASE_TIMEOUT):
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.lease_timeout = lease_timeout
+        self._idle = []
+        self._uses = {}
+        self._n_alive = 0
+        self._condition = threading.Condition()
+
+    def resize(self, max_size: int):
+        """Change the maximum number of browsers alive."""
+        with self._condition:
+            self.max_size = max(1, max_size)
+            self._condition.notify_all()
+
+    def _new_driver(self, headless, firefox):
+        # Avoid circular import
+        from cowidev.utils.web.scraping import new_driver
+
+        return new_driver(headless=headless, firefox=firefox)
+
+    def lease(self, headless: bool = True, download_folder: str = None, firefox: bool = False) -> LeasedDriver:
+        """Lease a browser. Blocks until one is available.
+
+        Args:
+            headless (bool, optional): Headless browser. Defaults to True.
+            download_folder (str, optional): Folder where downloads are saved. If None, a temporary folder is used,
+                                                which is removed on return. Defaults to None.
+            firefox (bool, optional): Use Firefox instead of Chrome. Defaults to False.
+
+        Raises:
+            TimeoutError: No browser available after `lease_timeout` seconds.
+
+        Returns:
+            LeasedDriver: Driver.
+        """
+        if firefox and download_folder is not None:
+            raise NotImplementedError("Download capabilities only supported for Chromedriver!")
+        key = (headless, firefox)
+        driver = self._acquire(key)
+        if driver is None:
+            driver = self._start(headless, firefox)
+        # Downloads
+        download_folder_tmp = None
+        if not firefox:
+            if download_folder is None:
+                download_folder = download_folder_tmp = tempfile.mkdtemp(prefix="cowidev-driver-")
+            self._set_downloads(driver, download_folder, download_folder_tmp)
+        self._uses[id(driver)] += 1
+        return LeasedDriver(self, driver, key, download_folder_tmp)
+
+    def _acquire(self, key):
+        """Take an idle browser of kind `key`, or reserve a slot for a new one (returns None)."""
+        deadline = time.monotonic() + self.lease_timeout
+        driver_old = None
+        with self._condition:
+            while True:
+                idle = [d for d in self._idle if d[0] == key]
+                if idle:
+                    self._idle.remove(idle[0])
+                    return idle[0][1]
+                if self._n_alive < self.max_size:
+                    self._n_alive += 1
+                    break
+                if self._idle:
+                    # Pool full with browsers of other kind: drop the oldest idle one
+                    _, driver_old = self._idle.pop(0)
+                    self._forget(driver_old)
+                    self._n_alive += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._condition.wait(remaining):
+                    raise TimeoutError(f"No browser available after {self.lease_timeout} seconds")
+        if driver_old is not None:
+            _quit(driver_old)
+        return None
+
+    def _start(self, headless, firefox):
+        """Start a new browser (its slot must be reserved)."""
+        try:
+            driver = self._new_driver(headless, firefox)
+        except Exception:
+            with self._condition:
+                self._n_alive -= 1
+                self._condition.notify()
+            raise
+        self._uses[id(driver)] = 0
+        return driver
+
+    def _set_downloads(self, driver, download_folder, download_folder_tmp):
+        """Set download folder. On failure, the browser is discarded."""
+        # Avoid circular import
+        from cowidev.utils.web.scraping import set_download_settings
+
+        try:
+            set_download_settings(driver, download_folder)
+        except Exception:
+            if download_folder_tmp is not None:
+                shutil.rmtree(download_folder_tmp, ignore_errors=True)
+            with self._condition:
+                self._forget(driver)
+                self._condition.notify()
+            _quit(driver)
+            raise
+
+    def release(self, leased: LeasedDriver):
+        """Return a leased browser to the pool."""
+        driver = leased._driver
+        if leased._download_folder is not None:
+            shutil.rmtree(leased._download_folder, ignore_errors=True)
+        reusable = not leased._crashed and self._uses.get(id(driver), 0) < self.max_uses and _reset(driver)
+        with self._condition:
+            keep = reusable and self._n_alive <= self.max_size
+            if keep:
+                self._idle.append((leased._key, driver))
+            else:
+                self._forget(driver)
+            self._condition.notify()
+        if not keep:
+            _quit(driver)
+
+    def _forget(self, driver):
+        """Remove browser from the pool (must hold the lock). It must then be quit with `_quit`, without the lock."""
+        self._n_alive -= 1
+        self._uses.pop(id(driver), None)
+
+    def close(self):
+        """Quit all idle browsers."""
+        with self._condition:
+            drivers = [driver for _, driver in self._idle]
+            self._idle.clear()
+            for driver in drivers:
+                self._forget(driver)
+            self._condition.notify_all()
+        for driver in drivers:
+            _quit(driver)
+
+
+def _quit(driver):
+    try:
+        driver.quit()
+    except Exception as err:
+        logger.warning(f"Could not quit browser: {err}")
+
+
+def _reset(driver) -> bool:
+    """Reset browser state between leases. Returns False if the browser is not responsive."""
+    try:
+        for handle in driver.window_handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(driver.window_handles[0])
+        driver.delete_all_cookies()
+        driver.get("about:blank")
+    except Exception:
+        return False
+    return True
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_driver_pool() -> DriverPool:
+    """Get the process-wide browser pool (created on first use)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = DriverPool()
+    return _pool
@@ -1,12 +1,27 @@
+import asyncio
+import hashlib
 import json
+import threading
+import time
+from collections import OrderedDict
 from urllib.error import URLError
 
-from bs4 import BeautifulSoup
-import requests
+from bs4 import BeautifulSoup, SoupStrainer
+import ijson
+import orjson
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options as ChroOpt
 from selenium.webdriver.firefox.options import Options as FireOpt
 
+from cowidev.utils.web.cache import get_cache, load_cached_content
+from cowidev.utils.web.client import get_client
+from cowidev.utils.web.download import open_url
+from cowidev.utils.web.drivers import get_driver_pool
+
+
+SOUP_CACHE_SIZE = 16
+"""Number of parsed documents kept in memory (see `get_soup`)."""
+
 
 def get_headers() -> dict:
     """Get generic header for requests.
@@ -33,15 +48,13 @@ def get_response(
     kwargs["headers"] = kwargs.get("headers", get_headers())
     kwargs["verify"] = kwargs.get("verify", True)
     kwargs["timeout"] = kwargs.get("timeout", 20)
-    try:
-        if request_method == "get":
-            response = requests.get(source, **kwargs)
-        elif request_method == "post":
-            response = requests.post(source, **kwargs)
-        else:
-            raise ValueError(f"Invalid value for `request_method`: {request_method}. Use 'get' or 'post'")
-    except Exception as err:
-        raise err
+    if request_method not in ["get", "post"]:
+        raise ValueError(f"Invalid value for `request_method`: {request_method}. Use 'get' or 'post'")
+    cache = get_cache()
+    if request_method == "get" and cache.enabled and not kwargs.get("stream"):
+        response = _get_response_cached(source, cache, **kwargs)
+    else:
+        response = get_client().request(request_method, source, **kwargs)
     if not response.ok:
         raise ValueError(
             f"Source {source} not reached! Error code {response.status_code} {response.reason}: {response.content}",
@@ -49,16 +62,64 @@ def get_response(
     return response
 
 
+def _get_response_cached(source, cache, headers, **kwargs):
+    """GET `source` through the on-disk response cache (see `cowidev.utils.web.cache`)."""
+
+    def _send(headers_request):
+        return get_client().request("get", source, headers=headers_request, stream=True, **kwargs)
+
+    response, body_path = cache.fetch(source, _send, params=kwargs.get("params"), headers=headers)
+    if body_path is not None:
+        load_cached_content(response, body_path)
+    return response
+
+
+async def get_response_async(source: str, request_method: str = "get", **kwargs):
+    """Asynchronous version of `get_response`.
+
+    Requests share the connection pools of `get_response`, hence per-host concurrency is still bounded.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, lambda: get_response(source, request_method, **kwargs))
+
+
+def get_responses(sources: list, request_method: str = "get", **kwargs) -> list:
+    """Get responses from all `sources` concurrently.
+
+    Args:
+        sources (list): List with URLs.
+        request_method (str, optional): Request method. Options are 'get' and 'post'. Defaults to GET method.
+        kwargs: Check `get_response` for the complete list of accepted arguments.
+
+    Returns:
+        list: Responses, in the same order as `sources`.
+    """
+
+    async def _gather():
+        return await asyncio.gather(*[get_response_async(source, request_method, **kwargs) for source in sources])
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(_gather())
+    finally:
+        loop.close()
+
+
 def get_soup(
     source: str,
     from_encoding: str = None,
     # parser="html.parser",
     parser="lxml",
     request_method: str = "get",
+    parse_only=None,
+    cache: bool = True,
     **kwargs,
 ) -> BeautifulSoup:
     """Get soup from website.
 
+    Soups are kept in an in-process cache keyed by URL and response body, so that modules reading the same page do not
+    parse it again. Cached soups are shared: do not modify them (or use `cache=False`).
+
     Args:
         source (str): Website url.
         from_encoding (str, optional): Encoding to use. Defaults to None.
@@ -66,39 +127,182 @@ def get_soup(
                                 #installing-a-parser. Defaults to 'lxml'.
         request_method (str, optional): Request method. Options are 'get' and 'post'. Defaults to GET method. For POST
                                         method, make sure to specify a header (default one does not work).
+        parse_only (optional): Only parse part of the document, which is faster for large pages. Either a
+                                `bs4.SoupStrainer`, tag name(s) to keep (e.g. 'table' or ['table', 'span']) or
+                                `SoupStrainer` arguments (e.g. {'name': 'div', 'class_': 'counter'}). Read
+                                https://www.crummy.com/software/BeautifulSoup/bs4/doc/#parsing-only-part-of-a-document.
+                                Defaults to None (parse everything).
+        cache (bool, optional): Use the in-process soup cache. Defaults to True.
         kwargs (dict): Extra arguments passed to requests.get method. Default values for `headers`, `verify` and
                         `timeout` are used.
     Returns:
         BeautifulSoup: Website soup.
     """
     response = get_response(source, request_method, **kwargs)
-    content = response.content
-    soup = BeautifulSoup(content, parser, from_encoding=from_encoding)
-    if soup.text == "":
-        soup = BeautifulSoup(content, "html.parser", from_encoding=from_encoding)
-    # print(response.url)
+    if isinstance(parse_only, dict):
+        parse_only = SoupStrainer(**parse_only)
+    elif parse_only is not None and not isinstance(parse_only, SoupStrainer):
+        parse_only = SoupStrainer(parse_only)
+    if not cache:
+        return _parse_soup(response.content, from_encoding=from_encoding, parser=parser, parse_only=parse_only)
+    key = (
+        source,
+        hashlib.sha1(response.content).hexdigest(),
+        parser,
+        from_encoding,
+        str(parse_only) if parse_only is not None else None,
+    )
+    soup = _soup_cache.get(key)
+    if soup is None:
+        soup = _parse_soup(response.content, from_encoding=from_encoding, parser=parser, parse_only=parse_only)
+        _soup_cache.set(key, soup)
+    return soup
+
+
+def _parse_soup(content: bytes, from_encoding: str = None, parser="lxml", parse_only=None) -> BeautifulSoup:
+    soup = BeautifulSoup(content, parser, from_encoding=from_encoding, parse_only=parse_only)
+    # Some documents are not parsed by lxml. Stops at the first non-empty string (same as `soup.text == ""`)
+    if not any(soup.strings):
+        soup = BeautifulSoup(content, "html.parser", from_encoding=from_encoding, parse_only=parse_only)
     return soup
 
 
-def request_json(url, mode="soup", **kwargs) -> dict:
+class _SoupCache:
+    """Thread-safe LRU cache of parsed documents."""
+
+    def __init__(self, max_size: int = SOUP_CACHE_SIZE):
+        self.max_size = max_size
+        self._soups = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            soup = self._soups.get(key)
+            if soup is not None:
+                self._soups.move_to_end(key)
+            return soup
+
+    def set(self, key, soup):
+        with self._lock:
+            self._soups[key] = soup
+            self._soups.move_to_end(key)
+            while len(self._soups) > self.max_size:
+                self._soups.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._soups.clear()
+
+
+_soup_cache = _SoupCache()
+
+
+def request_json(url, mode="auto", **kwargs) -> dict:
     """Get data from `url` as a dictionary.
 
     Content at `url` should be a dictionary.
 
     Args:
         url (str): URL to data.
-        mode (str): Mode to use. Accepted is 'soup' (default) and 'raw'.
+        mode (str): Mode to use. Accepted are 'auto' (default), 'soup' and 'raw'. 'auto' decodes the response bytes
+                    directly, and only falls back to 'soup' if they are not valid JSON (e.g. JSON embedded in HTML).
         kwargs: Check `get_soup` for the complete list of accepted arguments.
 
     Returns:
         dict: Data
     """
-    if mode == "soup":
+    if mode == "auto":
+        soup_kwargs = {k: kwargs.pop(k) for k in ["from_encoding", "parser"] if k in kwargs}
+        content = get_response(url, **kwargs).content
+        try:
+            return _loads_json(content)
+        except ValueError:
+            soup = _parse_soup(content, **soup_kwargs)
+            return json.loads(soup.text)
+    elif mode == "soup":
         text = request_text(url, **kwargs)
         return json.loads(text)
     elif mode == "raw":
         return get_response(url, **kwargs).json()
-    raise ValueError(f"Unrecognized `mode` value: {mode}. Accepted values are 'soup' and 'raw'.")
+    raise ValueError(f"Unrecognized `mode` value: {mode}. Accepted values are 'auto', 'soup' and 'raw'.")
+
+
+def request_json_items(url, path: str, where=None, timeout: int = 30, verify: bool = True) -> list:
+    """Get the items at `path` of the JSON document at `url`, without loading the whole document.
+
+    The document is parsed as a stream, and only the items at `path` (and passing `where`) are built. Use it for large
+    payloads of which only a small part is needed.
+
+    Example:
+        Get the distributions of region 'World' of CoVariants' data:
+
+        >>> request_json_items(url, "regions.item", where=lambda x: x["region"] == "World")[0]["distributions"]
+
+    Args:
+        url (str): URL to data.
+        path (str): Path to items, with keys separated by dots and `item` for elements of a list (e.g.
+                    'regions.item'). Read https://github.com/ICRAR/ijson#prefixes.
+        where (callable, optional): Items for which `where(item)` is false are dropped. Defaults to None.
+        timeout (int, optional): Request timeout, in seconds. Defaults to 30.
+        verify (bool, optional): Verify SSL certificates. Defaults to True.
+
+    Returns:
+        list: Items.
+    """
+    t0 = time.perf_counter()
+    with open_url(url, timeout=timeout, verify=verify) as f:
+        f = _CountingReader(f)
+        items = [item for item in ijson.items(f, path, use_float=True) if where is None or where(item)]
+    _add_json_stats(f.n_bytes, time.perf_counter() - t0)
+    return items
+
+
+def _loads_json(content: bytes):
+    t0 = time.perf_counter()
+    try:
+        data = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        # Non-standard JSON (e.g. NaN values)
+        data = json.loads(content)
+    _add_json_stats(len(content), time.perf_counter() - t0)
+    return data
+
+
+class _CountingReader:
+    """Binary file-like object wrapper that counts the bytes read."""
+
+    def __init__(self, f):
+        self._f = f
+        self.n_bytes = 0
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self.n_bytes += len(data)
+        return data
+
+
+_json_stats = threading.local()
+
+
+def _add_json_stats(n_bytes, seconds):
+    _json_stats.bytes = getattr(_json_stats, "bytes", 0) + n_bytes
+    _json_stats.time = getattr(_json_stats, "time", 0) + seconds
+
+
+def get_json_stats(reset: bool = False) -> dict:
+    """Get the JSON decoding cost accumulated by the current thread.
+
+    Args:
+        reset (bool, optional): Reset counters after reading them. Defaults to False.
+
+    Returns:
+        dict: Fields `bytes` (JSON bytes decoded) and `time` (seconds spent decoding).
+    """
+    stats = {"bytes": getattr(_json_stats, "bytes", 0), "time": getattr(_json_stats, "time", 0)}
+    if reset:
+        _json_stats.bytes = 0
+        _json_stats.time = 0
+    return stats
 
 
 def request_text(url, mode="soup", **kwargs) -> str:
@@ -141,7 +345,28 @@ def sel_options(headless: bool = True, firefox: bool = False):
     return op
 
 
-def get_driver(headless: bool = True, download_folder: str = None, options=None, firefox: bool = False):
+def get_driver(
+    headless: bool = True, download_folder: str = None, options=None, firefox: bool = False, pooled: bool = True
+):
+    """Get Selenium driver.
+
+    By default, the driver is leased from the pool of warm browsers (see `cowidev.utils.web.drivers`), and returned to
+    it when leaving the `with` block (or calling `quit`). Use it as `with get_driver() as driver: ...`.
+
+    Args:
+        headless (bool, optional): Headless browser. Defaults to True.
+        download_folder (str, optional): Folder where downloads are saved. Defaults to None.
+        options (optional): Custom browser options. Drivers with custom options are not pooled. Defaults to None.
+        firefox (bool, optional): Use Firefox instead of Chrome. Defaults to False.
+        pooled (bool, optional): Lease driver from pool. Set to False to launch a new browser. Defaults to True.
+    """
+    if pooled and options is None:
+        return get_driver_pool().lease(headless=headless, download_folder=download_folder, firefox=firefox)
+    return new_driver(headless=headless, download_folder=download_folder, options=options, firefox=firefox)
+
+
+def new_driver(headless: bool = True, download_folder: str = None, options=None, firefox: bool = False):
+    """Launch a new browser."""
     if options is None:
         options = sel_options(headless=headless, firefox=firefox)
     if firefox:
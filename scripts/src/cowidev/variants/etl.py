@@ -4,7 +4,7 @@ import pandas as pd
 
 from cowidev import PATHS
 from cowidev.utils.clean.dates import clean_date, DATE_FORMAT
-from cowidev.utils.web import request_json
+from cowidev.utils.web import request_json, request_json_items
 from cowidev import PATHS
 from cowidev.utils.s3 import obj_to_s3
 
@@ -70,9 +70,8 @@ class VariantsETL:
         return list(set(v["rename"] for v in self.variants_details.values() if v["who"]))
 
     def extract(self) -> dict:
-        data = request_json(self.source_url)
-        data = list(filter(lambda x: x["region"] == "World", data["regions"]))[0]["distributions"]
-        return data
+        data = request_json_items(self.source_url, "regions.item", where=lambda x: x["region"] == "World")
+        return data[0]["distributions"]
 
     @property
     def _parse_last_update_date(self):
@@ -29,6 +29,8 @@ MODULES_NAME = MODULES_NAME_BATCH + MODULES_NAME_INCREMENTAL
 LOG_MACHINES = "s3://covid-19/log/machines.json"
 LOG_GET_COUNTRIES = "s3://covid-19/log/vax-get-data-countries.csv"
 LOG_GET_GLOBAL = "s3://covid-19/log/vax-get-data-global.csv"
+# Only the latest runs are needed to sort modules by execution time
+LOG_TAIL_BYTES = 2 * 1024 * 1024
 
 
 class CountryDataGetter:
@@ -144,7 +146,7 @@ def _export_log_info(df_exec, t_sec_1, t_sec_2):
 def _load_modules_order(modules_name):
     if len(modules_name) < 10:
         return modules_name
-    df = obj_from_s3(LOG_GET_COUNTRIES)
+    df = obj_from_s3(LOG_GET_COUNTRIES, tail=LOG_TAIL_BYTES, usecols=["module", "date", "execution_time (sec)"])
     # Filter by machine
     # details = system_details()
     # machine = details["id"]
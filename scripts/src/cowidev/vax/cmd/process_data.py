@@ -5,6 +5,7 @@ import pandas as pd
 from pandas.core.base import DataError
 from pandas.errors import ParserError
 from cowidev import PATHS
+from cowidev.utils.io import write_table
 from cowidev.utils.log import get_logger, print_eoe
 from cowidev.cmd.vax.process.utils import process_location, VaccinationGSheet
 
@@ -71,7 +72,7 @@ def main_process_data(
         else:
             logger.info(f"{country}: SKIPPED 🚧")
     df = pd.concat(vax_valid).sort_values(by=["location", "date"])
-    df.to_csv(PATHS.INTERNAL_TMP_VAX_MAIN_FILE, index=False)
+    write_table(df.assign(date=pd.to_datetime(df.date)), PATHS.INTERNAL_TMP_VAX_MAIN_FILE)
     gsheet.metadata.to_csv(PATHS.INTERNAL_TMP_VAX_META_FILE, index=False)
     logger.info("Exported ✅")
     print_eoe()
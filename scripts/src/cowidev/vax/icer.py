@@ -1,5 +1,5 @@
 from cowidev.utils.log import get_logger
-from cowidev.utils.s3 import obj_to_s3
+from cowidev.utils.s3 import obj_to_s3, print_upload_stats
 from cowidev import PATHS
 
 from cowidev.vax.batch.latvia import Latvia
@@ -16,6 +16,7 @@ def main():
         logger.info(f"VAX - ICE - {country.location}")
         df = country.read()
         obj_to_s3(df, f"{PATH_ICE}/{country.location}.csv")
+    print_upload_stats()
 
 
 if __name__ == "__main__":
@@ -1,12 +1,10 @@
-import tempfile
 import re
 
 import pandas as pd
 from bs4 import BeautifulSoup
-from pdfminer.high_level import extract_text
 
 from cowidev.utils import clean_date, clean_count, get_soup
-from cowidev.utils.web.download import download_file_from_url
+from cowidev.utils.pdf import read_pdf_text
 from cowidev.vax.utils.base import CountryVaxBase
 from cowidev.vax.utils.incremental import enrich_data
 
@@ -63,10 +61,7 @@ class Azerbaijan(CountryVaxBase):
 
     def _parse_pdf_text(self, url: str) -> str:
         """Parse pdf text from url."""
-        with tempfile.NamedTemporaryFile() as tmp:
-            download_file_from_url(url, tmp.name)
-            with open(tmp.name, "rb") as f:
-                text = extract_text(f)
+        text = read_pdf_text(url)
         text = re.sub(r"(\d) (\d)", r"\1\2", text)
         text = re.sub(r"\s+", " ", text)
         return text
@@ -1,13 +1,10 @@
-import tempfile
 import re
 
 import pandas as pd
-from pdfminer.high_level import extract_text
-import tabula
 
 from cowidev.utils import clean_count, get_soup
 from cowidev.utils.clean import extract_clean_date
-from cowidev.utils.web.download import download_file_from_url
+from cowidev.utils.pdf import read_pdf_tables
 from cowidev.vax.utils.base import CountryVaxBase
 
 
@@ -60,9 +57,7 @@ class Kenya(CountryVaxBase):
     def _get_tables_from_pdf(self, url_pdf: str) -> str:
         """Get text from pdf file"""
         # Read all tables
-        with tempfile.NamedTemporaryFile() as tmp:
-            download_file_from_url(url_pdf, tmp.name, verify=False)
-            dfs = tabula.read_pdf(tmp.name, pages="all")
+        dfs = read_pdf_tables(url_pdf, verify=False, pages="all")
         return dfs
 
     def _build_dfs(self, dfs):
@@ -1,9 +1,9 @@
 import time
 
-import tabula
 
 from cowidev.utils.clean import clean_count, extract_clean_date
 from cowidev.utils.web import get_driver
+from cowidev.utils.pdf import read_pdf_tables
 from cowidev.vax.utils.incremental import increment
 
 
@@ -24,7 +24,7 @@ class Macao:
 
     def _parse_pdf_table(self, url):
         """Extract table"""
-        dfs = tabula.read_pdf(url)
+        dfs = read_pdf_tables(url)
         df = dfs[0]
         # Checks data
         cols = ["Unnamed: 0", "Unnamed: 1", "滅活疫苗", "Unnamed: 2", "其他種類疫苗", "Unnamed: 3", "Unnamed: 4"]
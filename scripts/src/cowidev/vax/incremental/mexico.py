@@ -1,11 +1,9 @@
-import tempfile
 import re
 
 import pandas as pd
-from pdfminer.high_level import extract_text
 
 from cowidev.utils import clean_count, clean_date, get_soup
-from cowidev.utils.web.download import download_file_from_url
+from cowidev.utils.pdf import read_pdf_text
 from cowidev.vax.utils.incremental import enrich_data, increment
 
 
@@ -35,10 +33,7 @@ class Mexico:
 
     def _get_text_from_pdf(self, url: str) -> str:
         """Get the text from the pdf url"""
-        with tempfile.NamedTemporaryFile() as tmp:
-            download_file_from_url(url, tmp.name)
-            with open(tmp.name, "rb") as f:
-                text = extract_text(f)
+        text = read_pdf_text(url)
         text = re.sub(r"\s+", " ", text)
         text = re.sub(r"(\d)\,(\d)", r"\1\2", text)
         return text
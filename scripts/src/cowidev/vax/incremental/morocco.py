@@ -14,7 +14,7 @@ class Morocco:
     source_url: str = "http://www.covidmaroc.ma/pages/Accueilfr.aspx"
 
     def read(self) -> pd.Series:
-        soup = get_soup(self.source_url)
+        soup = get_soup(self.source_url, parse_only="table")
         return self._parse_data(soup)
 
     def _parse_data(self, soup: BeautifulSoup) -> pd.Series:
@@ -1,11 +1,11 @@
 import re
 
 import pandas as pd
-import tabula
 
 from cowidev.utils.web import request_json
 from cowidev.utils.clean import clean_count, extract_clean_date
 from cowidev.utils.utils import check_known_columns
+from cowidev.utils.pdf import read_pdf_tables
 from cowidev.vax.utils.base import CountryVaxBase
 
 
@@ -42,7 +42,7 @@ class Nepal(CountryVaxBase):
 
     def _parse_pdf_table(self) -> pd.Series:
         """Extract table from pdf url"""
-        df_list = tabula.read_pdf(self.source_url_ref["manufacturer"], pages="1-3", stream=True)
+        df_list = read_pdf_tables(self.source_url_ref["manufacturer"], pages="1-3", stream=True)
         df = [table for table in df_list if "Pfizer" in table.columns][0]
         # Checks data
         check_known_columns(
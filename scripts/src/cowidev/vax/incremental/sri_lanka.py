@@ -2,12 +2,12 @@ import datetime
 import re
 
 import pandas as pd
-import tabula
 
 from cowidev.utils import get_soup
 from cowidev.utils.clean import clean_count
 from cowidev.utils.utils import check_known_columns
 from cowidev.utils.web import get_base_url
+from cowidev.utils.pdf import read_pdf_tables
 from cowidev.vax.utils.incremental import increment
 from cowidev.vax.utils.base import CountryVaxBase
 
@@ -50,7 +50,7 @@ class SriLanka(CountryVaxBase):
 
     def parse_metrics_from_pdf(self, pdf_path):
         print(pdf_path)
-        dfs = tabula.read_pdf(pdf_path)
+        dfs = read_pdf_tables(pdf_path)
         df = dfs[0]
 
         # All calculations below assume a fixed shape of the PDF's table, and a specific order for
@@ -1,12 +1,12 @@
 import re
 import math
 import pandas as pd
-import tabula
 
 from bs4 import BeautifulSoup
 
 from cowidev.utils.clean import clean_count, clean_date
 from cowidev.utils.web.scraping import get_soup, get_response
+from cowidev.utils.pdf import read_pdf_tables
 from cowidev.vax.utils.incremental import enrich_data, increment
 
 
@@ -84,7 +84,7 @@ class Taiwan:
 
     def _parse_tables_all(self, url_pdf: str) -> int:
         kwargs = {"pandas_options": {"dtype": str, "header": 0}, "lattice": True}
-        dfs = tabula.read_pdf(url_pdf, pages=1, **kwargs)
+        dfs = read_pdf_tables(url_pdf, pages=1, **kwargs)
         return dfs
 
     def parse_data(self, df: pd.DataFrame, soup):
@@ -2,7 +2,7 @@ import os
 import pandas as pd
 
 from cowidev import PATHS
-from cowidev.utils.s3 import S3, obj_from_s3
+from cowidev.utils.s3 import get_s3, obj_from_s3
 from cowidev.utils.utils import make_monotonic as mkm
 from cowidev.utils.clean.dates import localdate
 from cowidev.utils.clean.numbers import metrics_to_num_int, metrics_to_num_float
@@ -301,7 +301,7 @@ def _build_population_age_group_df(location, df):
 
 
 def _check_last_update(path, country):
-    metadata = S3().get_metadata(path)
+    metadata = get_s3().get_metadata(path)
     last_update = metadata["LastModified"]
     now = localdate(force_today=True, as_datetime=True)
     num_days = (now - last_update).days